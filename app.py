@@ -1,89 +1,54 @@
 import re
 import pandas as pd
 from collections import defaultdict
-from flask import Flask, request, render_template, send_file, redirect, url_for
+from flask import Flask, Response, g, request, render_template, send_file, redirect, url_for
 from io import BytesIO
 from datetime import datetime
 import pytz
 import xlsxwriter
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.utils import get_column_letter
 import sys
 import gc
 import json
 import time
 import claim_processor  # Import the new module
+import column_schema
+import daily_store
+import date_parsing
+import jobs
+import master_data
+import metrics
+import progress
+import report_cache
+import report_metrics
+import sheet_writer
+import store_dimension
+import upload_reader
+from mapping_engine import run_mapping, write_mapping_workbook
 
 app = Flask(__name__)
 
 # ---------------------------------------------------------
-# SHARED / DATA MAPPING LOGIC
+# METRICS
 # ---------------------------------------------------------
 
-sku_category_mapping = {
-    "Warranty : Water Cooler/Dispencer/Geyser/RoomCooler/Heater": [
-        "COOLER", "DISPENCER", "GEYSER", "ROOM COOLER", "HEATER", "WATER HEATER", "WATER DISPENSER"
-    ],
-    "Warranty : Fan/Mixr/IrnBox/Kettle/OTG/Grmr/Geysr/Steamr/Inductn": [
-        "FAN", "MIXER", "IRON BOX", "KETTLE", "OTG", "GROOMING KIT", "GEYSER", "STEAMER", "INDUCTION",
-        "CEILING FAN", "TOWER FAN", "PEDESTAL FAN", "INDUCTION COOKER", "ELECTRIC KETTLE", "WALL FAN", "MIXER GRINDER", "CELLING FAN"
-    ],
-    "AC : EWP : Warranty : AC": ["AC", "AIR CONDITIONER", "AC INDOOR"],
-    "HAEW : Warranty : Air Purifier/WaterPurifier": ["AIR PURIFIER", "WATER PURIFIER"],
-    "HAEW : Warranty : Dryer/MW/DishW": ["DRYER", "MICROWAVE OVEN", "DISH WASHER", "MICROWAVE OVEN-CONV"],
-    "HAEW : Warranty : Ref/WM": [
-        "REFRIGERATOR", "WASHING MACHINE", "WASHING MACHINE-TL", "REFRIGERATOR-DC",
-        "WASHING MACHINE-FL", "WASHING MACHINE-SA", "REF", "REFRIGERATOR-CBU", "REFRIGERATOR-FF", "WM"
-    ],
-    "HAEW : Warranty : TV": ["TV", "TV 28 %", "TV 18 %"],
-    "TV : TTC : Warranty and Protection : TV": ["TV", "TV 28 %", "TV 18 %"],
-    "TV : Spill and Drop Protection": ["TV", "TV 28 %", "TV 18 %"],
-    "HAEW : Warranty :Chop/Blend/Toast/Air Fryer/Food Processr/JMG/Induction": [
-        "CHOPPER", "BLENDER", "TOASTER", "AIR FRYER", "FOOD PROCESSOR", "JUICER", "INDUCTION COOKER"
-    ],
-    "HAEW : Warranty : HOB and Chimney": ["HOB", "CHIMNEY"],
-    "HAEW : Warranty : HT/SoundBar/AudioSystems/PortableSpkr": [
-        "HOME THEATRE", "AUDIO SYSTEM", "SPEAKER", "SOUND BAR", "PARTY SPEAKER"
-    ],
-    "HAEW : Warranty : Vacuum Cleaner/Fans/Groom&HairCare/Massager/Iron": [
-        "VACUUM CLEANER", "FAN", "MASSAGER", "IRON BOX", "CEILING FAN", "TOWER FAN", "PEDESTAL FAN", "WALL FAN", "ROBO VACCUM CLEANER"
-    ],
-    "AC AMC": ["AC", "AC INDOOR"]
-}
-
-def extract_price_slab(text):
-    match = re.search(r"Slab\s*:\s*(\d+)K-(\d+)K", str(text))
-    if match:
-        return int(match.group(1)) * 1000, int(match.group(2)) * 1000
-    return None, None
-
-def extract_warranty_duration(sku):
-    sku = str(sku)
-    match = re.search(r'Dur\s*:\s*(\d+)\+(\d+)', sku)
-    if match:
-        return int(match.group(1)), int(match.group(2))
-    match = re.search(r'(\d+)\+(\d+)\s*SDP-(\d+)', sku)
-    if match:
-        return int(match.group(1)), f"{match.group(3)}P+{match.group(2)}W"
-    match = re.search(r'Dur\s*:\s*(\d+)', sku)
-    if match:
-        return 1, int(match.group(1))
-    match = re.search(r'(\d+)\+(\d+)', sku)
-    if match:
-        return int(match.group(1)), int(match.group(2))
-    return '', ''
-
-def highlight_row(row):
-    missing_fields = pd.isna(row.get('Model')) or str(row.get('Model')).strip() == ''
-    missing_fields |= pd.isna(row.get('IMEI')) or str(row.get('IMEI')).strip() == ''
-    try:
-        if float(row.get('Plan Price', 0)) < 0:
-            missing_fields |= True
-    except:
-        missing_fields |= True
-    return ['background-color: lightblue'] * len(row) if missing_fields else [''] * len(row)
+metrics.register_collector("osg_jobs_active", jobs.active_count)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or "unmatched"
+        metrics.observe("osg_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        metrics.inc("osg_requests_total", endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ---------------------------------------------------------
 # ROUTES
@@ -95,7 +60,8 @@ def index():
 
 @app.route("/health")
 def health():
-    return {"status": "ok", "version": "4.0", "deployed": "2025-12-02 15:10"}
+    return {"status": "ok", "version": "4.0", "deployed": "2025-12-02 15:10", "report_cache": report_cache.stats(),
+            "jobs": {"active": jobs.active_count(), "max_pending": jobs.MAX_PENDING, "workers": jobs.MAX_WORKERS}}
 
 @app.route("/mapping")
 def mapping_page():
@@ -109,12 +75,52 @@ def report1_page():
 def report2_page():
     return render_template("report2.html")
 
+# ---------------------------------------------------------
+# PROCESS: OSG <-> PRODUCT MAPPING
+# ---------------------------------------------------------
+
+@app.route("/process_mapping", methods=["POST"])
+def process_mapping():
+    tracker = progress.Tracker.for_request("Mapping", request)
+    try:
+        start_time = time.time()
+        tracker.begin("parse", file="OSG")
+        osg_df = pd.read_excel(request.files['osg_file'])
+        tracker.end(rows=len(osg_df))
+        tracker.begin("parse", file="Product")
+        product_df = pd.read_excel(request.files['product_file'])
+        tracker.end(rows=len(product_df))
+
+        tracker.begin("map")
+        result = run_mapping(osg_df, product_df)
+        mapped_df = result.mapped
+        tracker.end(rows=len(mapped_df))
+        print(f"Mapped {len(mapped_df)} OSG rows against {len(product_df)} products in {time.time() - start_time:.2f}s "
+              f"({len(result.outside_slabs)} products outside every price slab, {int(result.flagged.sum())} rows flagged)", file=sys.stderr)
+
+        tracker.begin("render", sheet="Mapping")
+        output = BytesIO()
+        write_mapping_workbook(result, output)
+        tracker.close()
+
+        output.seek(0)
+        return send_file(output, as_attachment=True, download_name=f"OSG_Product_Mapping_{datetime.now().strftime('%Y%m%d')}.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    except column_schema.SchemaError as e:
+        tracker.close("error")
+        return f"ERROR: {e}", 400
+    except Exception as e:
+        import traceback
+        tracker.close("error")
+        return f"ERROR: {traceback.format_exc()}", 500
+
 # ---------------------------------------------------------
 # PROCESS: REPORT 1 (SALES REPORT) - STREAMLIT LOGIC PORT
 # ---------------------------------------------------------
 
 @app.route("/process_report1", methods=["POST"])
 def process_report1():
+    tracker = progress.Tracker.for_request("Report 1", request)
     try:
         print("=== START REPORT 1 PROCESSING (v4.0 - Streamlit Logic Port) ===", file=sys.stderr)
         
@@ -130,120 +136,93 @@ def process_report1():
         curr_osg_file = request.files['curr_osg_file']
         product_file = request.files['product_file']
         prev_osg_file = request.files.get('prev_osg_file')
+        download_name = f"OSG_Sales_Report_{datetime.now().strftime('%Y%m%d')}.xlsx"
+
+        # Repeat requests with the same uploads, dates and masters are served from the report cache
+        report_style = sheet_writer.table_style("REPORT1")
+        cache_params = {
+            'curr_osg_file': report_cache.upload_digest(curr_osg_file), 'product_file': report_cache.upload_digest(product_file),
+            'prev_osg_file': report_cache.upload_digest(prev_osg_file), 'report_date': request.form['report_date'],
+            'prev_date': request.form['prev_date'], 'style': tuple(report_style), 'daily_store': daily_store.version(),
+        }
+        cache_key = report_cache.report_key("report1", cache_params, master_data.MASTER_FILES)
+        tracker.begin("cache_lookup")
+        cached = report_cache.get(cache_key)
+        if cached is not None:
+            print("Report 1 served from cache.", file=sys.stderr)
+            tracker.close("cached")
+            return send_file(BytesIO(cached), as_attachment=True, download_name=download_name, mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         
         # Load Master Files
+        tracker.begin("master_load")
         try:
-            future_store_df = pd.read_excel("myG All Store.xlsx", engine='openpyxl')
-            rbm_df = pd.read_excel("RBM,BDM,BRANCH.xlsx", engine='openpyxl')
+            future_store_df = master_data.get_store_list()
+            rbm_df = master_data.get_rbm_map()
             print("Loaded master files.", file=sys.stderr)
         except Exception as e:
+            tracker.close("error")
             return f"Error loading master files: {e}", 500
+        tracker.end(rows=len(future_store_df))
 
-        # Process OSG File
-        book1_df = pd.read_excel(curr_osg_file, engine='openpyxl')
-        
-        # Robust Column Normalization for OSG
-        osg_renames = {}
-        for col in book1_df.columns:
-            c = str(col).strip().lower()
-            if c in ['date']: osg_renames[col] = 'DATE'
-            elif c in ['quantity', 'qty'] and 'billed' not in c: osg_renames[col] = 'QUANTITY'
-            elif 'billed' in c: osg_renames[col] = 'BILLED_QTY'
-            elif c in ['amount']: osg_renames[col] = 'AMOUNT'
-            elif c in ['branch', 'store']: osg_renames[col] = 'Store'
-        
-        # Priority check for Store
-        store_found = False
-        for p in ['store', 'store name', 'branch', 'branch name', 'outlet']:
-            for col in book1_df.columns:
-                if str(col).strip().lower() == p:
-                    osg_renames[col] = 'Store'
-                    store_found = True
-                    break
-            if store_found: break
-            
-        if osg_renames: book1_df.rename(columns=osg_renames, inplace=True)
+        # Process OSG File (only the columns the report uses)
+        tracker.begin("parse", file="OSG")
+        book1_df = upload_reader.read_upload(curr_osg_file, column_schema.OSG_SALES)
+        tracker.end(rows=len(book1_df))
         
         # Handle Quantity/Billed Qty
         if 'QUANTITY' not in book1_df.columns:
             if 'BILLED_QTY' in book1_df.columns: book1_df['QUANTITY'] = book1_df['BILLED_QTY']
             else: book1_df['QUANTITY'] = 1
 
-        book1_df['DATE'] = pd.to_datetime(book1_df['DATE'], dayfirst=True, errors='coerce')
-        book1_df = book1_df.dropna(subset=['DATE'])
+        tracker.begin("normalize", file="OSG")
+        book1_df = date_parsing.normalise_date_column(book1_df, "OSG")
+        tracker.end(rows=len(book1_df))
         
-        # Normalize RBM DF
-        rbm_renames = {}
-        for col in rbm_df.columns:
-            c = str(col).strip().lower()
-            if c in ['branch', 'store']: rbm_renames[col] = 'Store'
-            elif c in ['rbm', 'manager']: rbm_renames[col] = 'RBM'
-        if rbm_renames: rbm_df.rename(columns=rbm_renames, inplace=True)
-
         # Process Product File
-        product_df = pd.read_excel(product_file, engine='openpyxl')
-        prod_renames = {}
-        for col in product_df.columns:
-            c = str(col).strip().lower()
-            if c in ['branch', 'store']: prod_renames[col] = 'Store'
-            elif c in ['date']: prod_renames[col] = 'DATE'
-            elif c in ['sold price', 'amount', 'price']: prod_renames[col] = 'AMOUNT'
-            elif c in ['quantity', 'qty']: prod_renames[col] = 'QUANTITY'
-        if prod_renames: product_df.rename(columns=prod_renames, inplace=True)
+        tracker.begin("parse", file="Product")
+        product_df = upload_reader.read_upload(product_file, column_schema.PRODUCT_SALES)
+        tracker.end(rows=len(product_df))
         
-        product_df['DATE'] = pd.to_datetime(product_df['DATE'], dayfirst=True, errors='coerce')
-        product_df = product_df.dropna(subset=['DATE'])
+        tracker.begin("normalize", file="Product")
+        product_df = date_parsing.normalise_date_column(product_df, "Product")
+        tracker.end(rows=len(product_df))
         if 'QUANTITY' not in product_df.columns: product_df['QUANTITY'] = 1
 
-        # Aggregations
-        today = pd.to_datetime(report_date)
-        mtd_df = book1_df[book1_df['DATE'].dt.month == today.month]
-        today_df = mtd_df[mtd_df['DATE'].dt.date == today.date()]
-        
-        today_agg = today_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'FTD Count', 'AMOUNT': 'FTD Value'})
-        mtd_agg = mtd_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'MTD Count', 'AMOUNT': 'MTD Value'})
-
-        product_mtd_df = product_df[product_df['DATE'].dt.month == today.month]
-        product_today_df = product_mtd_df[product_mtd_df['DATE'].dt.date == today.date()]
-        
-        product_today_agg = product_today_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'Product_FTD_Count', 'AMOUNT': 'Product_FTD_Amount'})
-        product_mtd_agg = product_mtd_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'Product_MTD_Count', 'AMOUNT': 'Product_MTD_Amount'})
-
         # Previous Month
+        prev_df = None
         if prev_osg_file and prev_osg_file.filename != '':
-            prev_df = pd.read_excel(prev_osg_file, engine='openpyxl')
-            p_renames = {}
-            for col in prev_df.columns:
-                c = str(col).strip().lower()
-                if c in ['branch', 'store']: p_renames[col] = 'Store'
-                elif c in ['date']: p_renames[col] = 'DATE'
-                elif c in ['amount']: p_renames[col] = 'AMOUNT'
-            if p_renames: prev_df.rename(columns=p_renames, inplace=True)
-            
-            prev_df['DATE'] = pd.to_datetime(prev_df['DATE'], dayfirst=True, errors='coerce')
-            prev_df = prev_df.dropna(subset=['DATE'])
-            prev_month = pd.to_datetime(prev_date)
-            prev_mtd_df = prev_df[prev_df['DATE'].dt.month == prev_month.month]
-            prev_mtd_agg = prev_mtd_df.groupby('Store', as_index=False).agg({'AMOUNT': 'sum'}).rename(columns={'AMOUNT': 'PREV MONTH SALE'})
-        else:
-            prev_mtd_agg = pd.DataFrame(columns=['Store', 'PREV MONTH SALE'])
-
-        # Merge
-        for col in future_store_df.columns:
-            if str(col).strip().lower() in ['store', 'branch']:
-                future_store_df.rename(columns={col: 'Store'}, inplace=True)
-                break
-
-        all_stores_list = pd.concat([future_store_df['Store'], book1_df['Store'], product_df['Store']]).unique()
-        all_stores = pd.DataFrame(all_stores_list, columns=['Store'])
-        
-        report_df = all_stores.merge(today_agg, on='Store', how='left') \
-                              .merge(mtd_agg, on='Store', how='left') \
-                              .merge(product_today_agg, on='Store', how='left') \
-                              .merge(product_mtd_agg, on='Store', how='left') \
-                              .merge(prev_mtd_agg, on='Store', how='left') \
-                              .merge(rbm_df.rename(columns={'Branch': 'Store'})[['Store', 'RBM']], on='Store', how='left')
-
+            tracker.begin("parse", file="Previous month OSG")
+            prev_df = upload_reader.read_upload(prev_osg_file, column_schema.PREV_OSG_SALES)
+            tracker.end(rows=len(prev_df))
+            tracker.begin("normalize", file="Previous month OSG")
+            prev_df = date_parsing.normalise_date_column(prev_df, "Previous month OSG")
+            tracker.end(rows=len(prev_df))
+
+        # Daily aggregate store: upsert the uploaded days, then read the report month back.
+        # An uploaded previous-month file is used as is; the stored previous month only stands in for it.
+        if daily_store.ENABLED:
+            tracker.begin("merge", source="daily store")
+            daily_store.upsert('prev_osg', prev_df, "Previous month OSG", month=prev_date)
+            daily_store.upsert('osg', book1_df, "OSG", month=report_date)
+            daily_store.upsert('product', product_df, "Product", month=report_date)
+            book1_df = daily_store.read_month('osg', report_date)
+            product_df = daily_store.read_month('product', report_date)
+            if prev_df is None:
+                prev_df = daily_store.read_previous_month(prev_date)
+            cache_key = report_cache.report_key("report1", dict(cache_params, daily_store=daily_store.version()), master_data.MASTER_FILES)
+            tracker.end(rows=len(book1_df) + len(product_df) + len(prev_df))
+
+        # Encode every Store column against the store dimension (case/whitespace variants share one id)
+        tracker.begin("aggregate")
+        uploads = [book1_df, product_df] + ([prev_df] if prev_df is not None else [])
+        store_list, rbm_stores, *upload_stores = store_dimension.get_store_dimension().encode(
+            future_store_df['Store'], rbm_df['Store'], *(df['Store'] for df in uploads))
+        for df, stores in zip(uploads, upload_stores): df['Store'] = stores
+        rbm_df = rbm_df.assign(Store=rbm_stores)
+
+        # Aggregate every measure in one pass (master frames arrive already normalised to Store / RBM)
+        report_df = report_metrics.aggregate_stores(book1_df, product_df, prev_df, report_date, prev_date,
+                                                    store_list, rbm_df)
 
         # Fill NaNs
         required_columns = ['Store', 'FTD Count', 'FTD Value', 'Product_FTD_Amount', 'MTD Count', 'MTD Value', 'Product_MTD_Amount', 'PREV MONTH SALE', 'RBM']
@@ -255,15 +234,14 @@ def process_report1():
         cols_to_int = ['FTD Count', 'FTD Value', 'MTD Count', 'MTD Value', 'Product_FTD_Count', 'Product_FTD_Amount', 'Product_MTD_Count', 'Product_MTD_Amount', 'PREV MONTH SALE']
         report_df[cols_to_int] = report_df[cols_to_int].fillna(0).astype(int)
 
-        # Metrics
-        report_df['DIFF %'] = report_df.apply(lambda x: round(((x['MTD Value'] - x['PREV MONTH SALE']) / x['PREV MONTH SALE']) * 100, 2) if x['PREV MONTH SALE'] != 0 else 0, axis=1)
-        report_df['ASP'] = report_df.apply(lambda x: round(x['MTD Value'] / x['MTD Count'], 2) if x['MTD Count'] != 0 else 0, axis=1)
-        report_df['FTD Value Conversion'] = report_df.apply(lambda x: round((x['FTD Value'] / x['Product_FTD_Amount']) * 100, 2) if x['Product_FTD_Amount'] != 0 else 0, axis=1)
-        report_df['MTD Value Conversion'] = report_df.apply(lambda x: round((x['MTD Value'] / x['Product_MTD_Amount']) * 100, 2) if x['Product_MTD_Amount'] != 0 else 0, axis=1)
+        # Metrics: per-store ratios, then all-store and per-RBM totals in one pass
+        report_df = report_metrics.add_ratios(report_df)
+        totals = report_metrics.group_totals(report_df, by='RBM')
+        tracker.end(rows=len(report_df))
 
         # Excel Generation
         excel_output = BytesIO()
-        with pd.ExcelWriter(excel_output, engine='xlsxwriter') as writer:
+        with pd.ExcelWriter(excel_output, engine='xlsxwriter', engine_kwargs=sheet_writer.WORKBOOK_OPTIONS) as writer:
             workbook = writer.book
             
             colors_palette = {
@@ -312,29 +290,22 @@ def process_report1():
             ist = pytz.timezone('Asia/Kolkata')
             ist_time = datetime.now(ist)
 
-            # ALL STORES SHEET
-            all_data = report_df.sort_values('MTD Value', ascending=False)
+            # ALL STORES SHEET (stores ranked once; the RBM sheets reuse this order)
+            all_data = report_df.sort_values('MTD Value', ascending=False, kind='stable')
+            tracker.begin("render", sheet="All Stores")
             worksheet = workbook.add_worksheet("All Stores")
             headers = ['Store Name', 'FTD Count', 'FTD Value', 'FTD Value Conversion', 'MTD Count', 'MTD Value', 'MTD Value Conversion', 'PREV MONTH SALE', 'DIFF %', 'ASP']
             
             # Column Widths
-            column_widths = {}
-            for i in range(len(headers)):
-                try:
-                    if i == 0:
-                        max_len = max(all_data[headers[i]].astype(str).map(len).max(), len(headers[i])) + 2
-                    else:
-                        max_len = max(all_data[headers[i]].map(lambda x: len(str(x))).max() if headers[i] in all_data.columns else 0, len(headers[i])) + 2
-                    column_widths[i] = max(max_len, 10)
-                except KeyError:
-                    column_widths[i] = len(headers[i]) + 2
-                worksheet.set_column(i, i, column_widths[i])
+            for i, width in enumerate(sheet_writer.column_widths(all_data, headers)):
+                worksheet.set_column(i, i, width)
 
             worksheet.merge_range(0, 0, 0, len(headers) - 1, "OSG All Stores Sales Report", formats['title'])
             worksheet.merge_range(1, 0, 1, len(headers) - 1, f"Report Generated: {ist_time.strftime('%d %B %Y %I:%M %p IST')}", formats['subtitle'])
 
-            total_stores = len(all_data)
-            active_stores = len(all_data[all_data['FTD Count'] > 0])
+            overall = totals.overall
+            total_stores = overall['Stores']
+            active_stores = overall['Active Stores']
             inactive_stores = total_stores - active_stores
             worksheet.merge_range(3, 0, 3, 1, "📊 SUMMARY", formats['header_secondary'])
             worksheet.merge_range(3, 2, 3, len(headers) - 1, f"Total: {total_stores} | Active: {active_stores} | Inactive: {inactive_stores}", formats['data_normal'])
@@ -342,83 +313,66 @@ def process_report1():
             for col, header in enumerate(headers):
                 worksheet.write(5, col, header, formats['header_main'])
 
-            for row_idx, (_, row) in enumerate(all_data.iterrows(), start=6):
-                is_alt = (row_idx - 6) % 2 == 1
-                worksheet.write(row_idx, 0, row['Store Name'], formats['data_store_name_alt'] if is_alt else formats['data_store_name'])
-                worksheet.write(row_idx, 1, int(row['FTD Count']), formats['data_alternate'] if is_alt else formats['data_normal'])
-                worksheet.write(row_idx, 2, int(row['FTD Value']), formats['data_alternate'] if is_alt else formats['data_normal'])
-                
-                ftd_conv = row['FTD Value Conversion']
-                fmt = formats['conversion_format_alt'] if is_alt else formats['conversion_format']
-                if ftd_conv > 2: fmt = formats['conversion_green']
-                elif ftd_conv < 2: fmt = formats['conversion_low']
-                worksheet.write(row_idx, 3, ftd_conv/100, fmt)
-
-                worksheet.write(row_idx, 4, int(row['MTD Count']), formats['data_alternate'] if is_alt else formats['data_normal'])
-                worksheet.write(row_idx, 5, int(row['MTD Value']), formats['data_alternate'] if is_alt else formats['data_normal'])
-
-                mtd_conv = row['MTD Value Conversion']
-                fmt = formats['conversion_format_alt'] if is_alt else formats['conversion_format']
-                if mtd_conv > 2: fmt = formats['conversion_green']
-                elif mtd_conv < 2: fmt = formats['conversion_low']
-                worksheet.write(row_idx, 6, mtd_conv/100, fmt)
-
-                worksheet.write(row_idx, 7, int(row['PREV MONTH SALE']), formats['data_alternate'] if is_alt else formats['data_normal'])
-                worksheet.write(row_idx, 8, f"{row['DIFF %']}%", formats['data_alternate'] if is_alt else formats['data_normal'])
-                worksheet.write(row_idx, 9, row['ASP'], formats['asp_format_alt'] if is_alt else formats['asp_format'])
+            # Data rows: values straight from the columns; striping and conversion thresholds per report_style
+            Column = sheet_writer.Column
+            conv_threshold = report_style.conversion_threshold / 100
+            sheet_writer.write_table(worksheet, 6, [
+                Column(all_data['Store Name'].tolist(), formats['data_store_name'], formats['data_store_name_alt']),
+                Column(all_data['FTD Count'].tolist(), formats['data_normal'], formats['data_alternate']),
+                Column(all_data['FTD Value'].tolist(), formats['data_normal'], formats['data_alternate']),
+                Column((all_data['FTD Value Conversion'] / 100).tolist(), formats['conversion_format'], formats['conversion_format_alt'], formats['conversion_green'], formats['conversion_low'], conv_threshold),
+                Column(all_data['MTD Count'].tolist(), formats['data_normal'], formats['data_alternate']),
+                Column(all_data['MTD Value'].tolist(), formats['data_normal'], formats['data_alternate']),
+                Column((all_data['MTD Value Conversion'] / 100).tolist(), formats['conversion_format'], formats['conversion_format_alt'], formats['conversion_green'], formats['conversion_low'], conv_threshold),
+                Column(all_data['PREV MONTH SALE'].tolist(), formats['data_normal'], formats['data_alternate']),
+                Column([f"{v}%" for v in all_data['DIFF %'].tolist()], formats['data_normal'], formats['data_alternate']),
+                Column(all_data['ASP'].tolist(), formats['asp_format'], formats['asp_format_alt']),
+            ], report_style)
 
             # Total Row
             total_row = len(all_data) + 7
             worksheet.write(total_row, 0, '🎯 TOTAL', formats['total_label'])
-            worksheet.write(total_row, 1, all_data['FTD Count'].sum(), formats['total_row'])
-            worksheet.write(total_row, 2, all_data['FTD Value'].sum(), formats['total_row'])
-            total_ftd_conv = round((all_data['FTD Value'].sum() / all_data['Product_FTD_Amount'].sum()) * 100, 2) if all_data['Product_FTD_Amount'].sum() != 0 else 0
-            worksheet.write(total_row, 3, f"{total_ftd_conv}%", formats['total_row'])
-            worksheet.write(total_row, 4, all_data['MTD Count'].sum(), formats['total_row'])
-            worksheet.write(total_row, 5, all_data['MTD Value'].sum(), formats['total_row'])
-            total_mtd_conv = round((all_data['MTD Value'].sum() / all_data['Product_MTD_Amount'].sum()) * 100, 2) if all_data['Product_MTD_Amount'].sum() != 0 else 0
-            worksheet.write(total_row, 6, f"{total_mtd_conv}%", formats['total_row'])
-            worksheet.write(total_row, 7, all_data['PREV MONTH SALE'].sum(), formats['total_row'])
-            total_diff = round(((all_data['MTD Value'].sum() - all_data['PREV MONTH SALE'].sum()) / all_data['PREV MONTH SALE'].sum()) * 100, 2) if all_data['PREV MONTH SALE'].sum() != 0 else 0
-            worksheet.write(total_row, 8, f"{total_diff}%", formats['total_row'])
-            total_asp = round(all_data['MTD Value'].sum() / all_data['MTD Count'].sum(), 2) if all_data['MTD Count'].sum() != 0 else 0
-            worksheet.write(total_row, 9, total_asp, formats['asp_total'])
+            worksheet.write(total_row, 1, overall['FTD Count'], formats['total_row'])
+            worksheet.write(total_row, 2, overall['FTD Value'], formats['total_row'])
+            worksheet.write(total_row, 3, f"{overall['FTD Value Conversion']}%", formats['total_row'])
+            worksheet.write(total_row, 4, overall['MTD Count'], formats['total_row'])
+            worksheet.write(total_row, 5, overall['MTD Value'], formats['total_row'])
+            worksheet.write(total_row, 6, f"{overall['MTD Value Conversion']}%", formats['total_row'])
+            worksheet.write(total_row, 7, overall['PREV MONTH SALE'], formats['total_row'])
+            worksheet.write(total_row, 8, f"{overall['DIFF %']}%", formats['total_row'])
+            worksheet.write(total_row, 9, overall['ASP'], formats['asp_total'])
 
             if len(all_data) > 0:
                 top_performer = all_data.iloc[0]
                 insights_row = total_row + 2
                 worksheet.merge_range(insights_row, 0, insights_row, len(headers) - 1, f"🏆 Top Performer: {top_performer['Store Name']} (₹{int(top_performer['MTD Value']):,})", formats['data_normal'])
+            tracker.end(rows=len(all_data))
 
-            # RBM SHEETS
+            # RBM SHEETS: one grouped pass over the sorted stores gives each sheet's rows, widths and summaries
             if 'RBM' in report_df.columns:
                 rbm_headers = ['Store Name', 'MTD Value Conversion', 'FTD Value Conversion', 'MTD Count', 'FTD Count', 'MTD Value', 'FTD Value', 'PREV MONTH SALE', 'DIFF %', 'ASP']
+                rbm_groups = dict(list(all_data.groupby('RBM', sort=False)))
+                rbm_widths = sheet_writer.column_widths(all_data, rbm_headers, by='RBM')
                 for rbm in report_df['RBM'].dropna().unique():
                     if str(rbm) == 'Unknown' or str(rbm) == 'nan': continue
                     
-                    rbm_data = report_df[report_df['RBM'] == rbm].sort_values('MTD Value', ascending=False)
+                    rbm_data = rbm_groups[rbm]
                     worksheet_name = str(rbm)[:31]
+                    tracker.begin("render", sheet=worksheet_name)
                     rbm_ws = workbook.add_worksheet(worksheet_name)
 
                     # Column Widths
-                    rbm_column_widths = {}
-                    for i in range(len(rbm_headers)):
-                        try:
-                            if i == 0:
-                                max_len = max(rbm_data[rbm_headers[i]].astype(str).map(len).max(), len(rbm_headers[i])) + 2
-                            else:
-                                max_len = max(rbm_data[rbm_headers[i]].map(lambda x: len(str(x))).max() if rbm_headers[i] in rbm_data.columns else 0, len(rbm_headers[i])) + 2
-                            rbm_column_widths[i] = max(max_len, 10)
-                        except KeyError:
-                            rbm_column_widths[i] = len(rbm_headers[i]) + 2
-                        rbm_ws.set_column(i, i, rbm_column_widths[i])
+                    for i, width in enumerate(rbm_widths.loc[rbm]):
+                        rbm_ws.set_column(i, i, width)
 
                     rbm_ws.merge_range(0, 0, 0, len(rbm_headers) - 1, f" {rbm} - Sales Performance Report", formats['rbm_title'])
                     rbm_ws.merge_range(1, 0, 1, len(rbm_headers) - 1, f"Report Period: {ist_time.strftime('%B %Y')} | Generated: {ist_time.strftime('%d %B %Y %I:%M %p IST')}", formats['rbm_subtitle'])
 
-                    rbm_total_stores = len(rbm_data)
-                    rbm_active_stores = len(rbm_data[rbm_data['FTD Count'] > 0])
+                    rbm_totals = totals.by_group.loc[rbm]
+                    rbm_total_stores = rbm_totals['Stores']
+                    rbm_active_stores = rbm_totals['Active Stores']
                     rbm_inactive_stores = rbm_total_stores - rbm_active_stores
-                    rbm_total_amount = rbm_data['MTD Value'].sum()
+                    rbm_total_amount = rbm_totals['MTD Value']
 
                     rbm_ws.merge_range(3, 0, 3, 1, "📈 PERFORMANCE OVERVIEW", formats['rbm_summary'])
                     rbm_ws.merge_range(3, 2, 3, len(rbm_headers) - 1, f"Total Stores: {rbm_total_stores} | Active: {rbm_active_stores} | Inactive: {rbm_inactive_stores} | Total Revenue: ₹{rbm_total_amount:,}", formats['rbm_summary'])
@@ -430,49 +384,29 @@ def process_report1():
                     for col, header in enumerate(rbm_headers):
                         rbm_ws.write(6, col, header, formats['rbm_header'])
 
-                    for row_idx, (_, row) in enumerate(rbm_data.iterrows(), start=7):
-                        is_alt = (row_idx - 7) % 2 == 1
-                        rbm_ws.write(row_idx, 0, row['Store Name'], formats['rbm_store_name_alt'] if is_alt else formats['rbm_store_name'])
-                        
-                        mtd_conv = row['MTD Value Conversion']
-                        fmt = formats['rbm_conversion_format_alt'] if is_alt else formats['rbm_conversion_format']
-                        if mtd_conv > 2: rbm_ws.write(row_idx, 1, mtd_conv/100, formats['rbm_conversion_green'])
-                        elif mtd_conv < 2: rbm_ws.write(row_idx, 1, mtd_conv/100, formats['rbm_conversion_low'])
-                        else: rbm_ws.write(row_idx, 1, mtd_conv/100, fmt)
-
-                        ftd_conv = row['FTD Value Conversion']
-                        if ftd_conv > 2: rbm_ws.write(row_idx, 2, ftd_conv/100, formats['rbm_conversion_green'])
-                        elif ftd_conv < 2: rbm_ws.write(row_idx, 2, ftd_conv/100, formats['rbm_conversion_low'])
-                        else: rbm_ws.write(row_idx, 2, ftd_conv/100, fmt)
-
-                        data_fmt = formats['rbm_data_alternate'] if is_alt else formats['rbm_data_normal']
-                        rbm_ws.write(row_idx, 3, int(row['MTD Count']), data_fmt)
-                        rbm_ws.write(row_idx, 4, int(row['FTD Count']), data_fmt)
-                        rbm_ws.write(row_idx, 5, int(row['MTD Value']), data_fmt)
-                        rbm_ws.write(row_idx, 6, int(row['FTD Value']), data_fmt)
-                        rbm_ws.write(row_idx, 7, int(row['PREV MONTH SALE']), data_fmt)
-                        rbm_ws.write(row_idx, 8, f"{row['DIFF %']}%", data_fmt)
-                        rbm_ws.write(row_idx, 9, row['ASP'], formats['asp_format_alt'] if is_alt else formats['asp_format'])
+                    sheet_writer.write_table(rbm_ws, 7, [
+                        Column(rbm_data['Store Name'].tolist(), formats['rbm_store_name'], formats['rbm_store_name_alt']),
+                        Column((rbm_data['MTD Value Conversion'] / 100).tolist(), formats['rbm_conversion_format'], formats['rbm_conversion_format_alt'], formats['rbm_conversion_green'], formats['rbm_conversion_low'], conv_threshold),
+                        Column((rbm_data['FTD Value Conversion'] / 100).tolist(), formats['rbm_conversion_format'], formats['rbm_conversion_format_alt'], formats['rbm_conversion_green'], formats['rbm_conversion_low'], conv_threshold),
+                    ] + [Column(rbm_data[col].tolist(), formats['rbm_data_normal'], formats['rbm_data_alternate'])
+                         for col in ['MTD Count', 'FTD Count', 'MTD Value', 'FTD Value', 'PREV MONTH SALE']] + [
+                        Column([f"{v}%" for v in rbm_data['DIFF %'].tolist()], formats['rbm_data_normal'], formats['rbm_data_alternate']),
+                        Column(rbm_data['ASP'].tolist(), formats['asp_format'], formats['asp_format_alt']),
+                    ], report_style)
 
                     total_row = len(rbm_data) + 8
                     rbm_ws.write(total_row, 0, '🎯 TOTAL', formats['rbm_total_label'])
-                    rbm_total_mtd = round((rbm_data['MTD Value'].sum() / rbm_data['Product_MTD_Amount'].sum()) * 100, 2) if rbm_data['Product_MTD_Amount'].sum() != 0 else 0
-                    rbm_ws.write(total_row, 1, f"{rbm_total_mtd}%", formats['rbm_total'])
-                    rbm_total_ftd = round((rbm_data['FTD Value'].sum() / rbm_data['Product_FTD_Amount'].sum()) * 100, 2) if rbm_data['Product_FTD_Amount'].sum() != 0 else 0
-                    rbm_ws.write(total_row, 2, f"{rbm_total_ftd}%", formats['rbm_total'])
-                    rbm_ws.write(total_row, 3, rbm_data['MTD Count'].sum(), formats['rbm_total'])
-                    rbm_ws.write(total_row, 4, rbm_data['FTD Count'].sum(), formats['rbm_total'])
-                    rbm_ws.write(total_row, 5, rbm_data['MTD Value'].sum(), formats['rbm_total'])
-                    rbm_ws.write(total_row, 6, rbm_data['FTD Value'].sum(), formats['rbm_total'])
-                    rbm_ws.write(total_row, 7, rbm_data['PREV MONTH SALE'].sum(), formats['rbm_total'])
+                    rbm_ws.write(total_row, 1, f"{rbm_totals['MTD Value Conversion']}%", formats['rbm_total'])
+                    rbm_ws.write(total_row, 2, f"{rbm_totals['FTD Value Conversion']}%", formats['rbm_total'])
+                    rbm_ws.write(total_row, 3, rbm_totals['MTD Count'], formats['rbm_total'])
+                    rbm_ws.write(total_row, 4, rbm_totals['FTD Count'], formats['rbm_total'])
+                    rbm_ws.write(total_row, 5, rbm_totals['MTD Value'], formats['rbm_total'])
+                    rbm_ws.write(total_row, 6, rbm_totals['FTD Value'], formats['rbm_total'])
+                    rbm_ws.write(total_row, 7, rbm_totals['PREV MONTH SALE'], formats['rbm_total'])
                     
-                    total_prev = rbm_data['PREV MONTH SALE'].sum()
-                    total_curr = rbm_data['MTD Value'].sum()
-                    growth = round(((total_curr - total_prev) / total_prev) * 100, 2) if total_prev != 0 else 0
+                    growth = rbm_totals['DIFF %']
                     rbm_ws.write(total_row, 8, f"{growth}%", formats['rbm_total'])
-                    
-                    overall_asp = round(rbm_data['MTD Value'].sum() / rbm_data['MTD Count'].sum(), 2) if rbm_data['MTD Count'].sum() != 0 else 0
-                    rbm_ws.write(total_row, 9, overall_asp, formats['asp_total'])
+                    rbm_ws.write(total_row, 9, rbm_totals['ASP'], formats['asp_total'])
 
                     insights_row = total_row + 2
                     if growth > 15:
@@ -487,12 +421,23 @@ def process_report1():
                     if len(top_3_stores) > 0:
                         top_stores_text = " | ".join([f"{store['Store Name']}: ₹{int(store['MTD Value']):,}" for _, store in top_3_stores.iterrows()])
                         rbm_ws.merge_range(insights_row, 0, insights_row, len(rbm_headers) - 1, f"🏆 Top 3 Performers: {top_stores_text}", formats['rbm_summary'])
+                    tracker.end(rows=len(rbm_data))
 
+            # Closing the writer assembles the workbook from the flushed sheets
+            tracker.begin("save")
+        tracker.end()
+
+        report_cache.put(cache_key, excel_output.getvalue())
+        tracker.close()
         excel_output.seek(0)
-        return send_file(excel_output, as_attachment=True, download_name=f"OSG_Sales_Report_{datetime.now().strftime('%Y%m%d')}.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        return send_file(excel_output, as_attachment=True, download_name=download_name, mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
+    except column_schema.SchemaError as e:
+        tracker.close("error")
+        return f"ERROR: {e}", 400
     except Exception as e:
         import traceback
+        tracker.close("error")
         return f"ERROR: {traceback.format_exc()}", 500
 
 # ---------------------------------------------------------
@@ -501,6 +446,7 @@ def process_report1():
 
 @app.route("/process_report2", methods=["POST"])
 def process_report2():
+    tracker = progress.Tracker.for_request("Report 2", request)
     try:
         report_date = pd.to_datetime(request.form['report_date'])
         time_slot = request.form['time_slot']
@@ -508,17 +454,38 @@ def process_report2():
 
         formatted_date = report_date.strftime("%d-%m-%Y")
         report_title = f"{formatted_date} EW Sale Till {time_slot}"
-
-        future_df = pd.read_excel("Future Store List.xlsx")
-        book2_df = pd.read_excel(sales_file)
-        book2_df.rename(columns={'Branch': 'Store'}, inplace=True)
-
-        agg = book2_df.groupby('Store', as_index=False).agg({
+        download_name = f"Store_Summary_{formatted_date}_{time_slot}.xlsx"
+
+        cache_key = report_cache.report_key("report2", {
+            'sales_file': report_cache.upload_digest(sales_file), 'report_date': request.form['report_date'], 'time_slot': time_slot,
+        }, master_data.MASTER_FILES)
+        tracker.begin("cache_lookup")
+        cached = report_cache.get(cache_key)
+        if cached is not None:
+            print("Report 2 served from cache.", file=sys.stderr)
+            tracker.close("cached")
+            return send_file(BytesIO(cached), as_attachment=True, download_name=download_name, mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+        tracker.begin("master_load")
+        future_df = master_data.get_future_stores()
+        tracker.end(rows=len(future_df))
+
+        tracker.begin("parse", file="Sales")
+        book2_df = upload_reader.read_upload(sales_file, column_schema.DAY_SALES)
+        tracker.end(rows=len(book2_df))
+
+        tracker.begin("aggregate")
+        future_stores, book2_df['Store'] = store_dimension.get_store_dimension().encode(future_df['Store'], book2_df['Store'])
+
+        agg = book2_df.groupby('Store', as_index=False, observed=True).agg({
             'QUANTITY': 'sum',
             'AMOUNT': 'sum'
         })
+        tracker.end(rows=len(agg))
+
+        tracker.begin("merge", source="future stores")
 
-        all_stores = pd.DataFrame(pd.concat([future_df['Store'], agg['Store']]).unique(), columns=['Store'])
+        all_stores = pd.DataFrame(pd.concat([future_stores, agg['Store']]).unique(), columns=['Store'])
         merged = all_stores.merge(agg, on='Store', how='left')
         merged['QUANTITY'] = merged['QUANTITY'].fillna(0).astype(int)
         merged['AMOUNT'] = merged['AMOUNT'].fillna(0).astype(int)
@@ -533,60 +500,24 @@ def process_report2():
 
         final_df = pd.concat([merged, total], ignore_index=True)
         final_df.rename(columns={'Store': 'Branch'}, inplace=True)
+        tracker.end(rows=len(merged))
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Store Report"
-
-        ws.merge_cells('A1:C1')
-        title_cell = ws['A1']
-        title_cell.value = report_title
-        title_cell.font = Font(bold=True, size=11, color="FFFFFF")
-        title_cell.alignment = Alignment(horizontal='center')
-        title_cell.fill = PatternFill("solid", fgColor="4F81BD")
-
-        header_fill = PatternFill("solid", fgColor="4F81BD")
-        data_fill = PatternFill("solid", fgColor="DCE6F1")
-        red_fill = PatternFill("solid", fgColor="F4CCCC")
-        total_fill = PatternFill("solid", fgColor="10B981")
-        border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        header_font = Font(bold=True, color="FFFFFF")
-        bold_font = Font(bold=True, color="FFFFFF")
-
-        for r_idx, row in enumerate(dataframe_to_rows(final_df, index=False, header=True), start=2):
-            for c_idx, value in enumerate(row, 1):
-                cell = ws.cell(row=r_idx, column=c_idx, value=value)
-                if r_idx == 2:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                elif final_df.loc[r_idx - 3, 'Branch'] == 'TOTAL':
-                    cell.fill = total_fill
-                    cell.font = bold_font
-                elif final_df.loc[r_idx - 3, 'AMOUNT'] <= 0:
-                    cell.fill = red_fill
-                else:
-                    cell.fill = data_fill
-                cell.border = border
-                cell.alignment = Alignment(horizontal='center')
-
-        for col_idx, column_cells in enumerate(ws.columns, start=1):
-            max_length = 0
-            for cell in column_cells:
-                try:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except:
-                    pass
-            ws.column_dimensions[get_column_letter(col_idx)].width = max_length + 2
-
+        tracker.begin("render", sheet="Store Report")
         output = BytesIO()
-        wb.save(output)
+        sheet_writer.write_day_view(final_df, report_title, output)
+        tracker.end(rows=len(final_df))
+        report_cache.put(cache_key, output.getvalue())
+        tracker.close()
         output.seek(0)
 
-        return send_file(output, as_attachment=True, download_name=f"Store_Summary_{formatted_date}_{time_slot}.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        return send_file(output, as_attachment=True, download_name=download_name, mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
+    except column_schema.SchemaError as e:
+        tracker.close("error")
+        return f"ERROR: {e}", 400
     except Exception as e:
         import traceback
+        tracker.close("error")
         error_details = traceback.format_exc()
         print("ERROR IN REPORT 2:")
         print(error_details)
@@ -617,6 +548,52 @@ def process_report2():
         </html>
         """, 500
 
+# ---------------------------------------------------------
+# BACKGROUND JOBS (REPORT 1 / REPORT 2)
+# ---------------------------------------------------------
+
+@app.route("/jobs/submit/<report>", methods=["POST"])
+def submit_job(report):
+    if report not in jobs.ROUTES:
+        return {"error": f"Unknown report: {report}"}, 404
+    try:
+        files = {name: (f.filename, f.read()) for name, f in request.files.items() if f.filename}
+        job_id = jobs.submit(report, request.form.to_dict(), files)
+    except jobs.QueueFull as e:
+        return {"error": str(e)}, 503, {"Retry-After": "30"}
+    except Exception as e:
+        import traceback
+        return {"error": traceback.format_exc()}, 500
+    return {
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id),
+        "result_url": url_for('job_result', job_id=job_id),
+        "events_url": url_for('progress_events', progress_id=job_id),
+    }, 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    record = jobs.status(job_id)
+    if record is None:
+        return {"error": "Unknown or expired job"}, 404
+    record.pop("form", None)
+    return record
+
+@app.route("/progress/<progress_id>/events")
+def progress_events(progress_id):
+    last_id = request.headers.get("Last-Event-ID", "")
+    start = int(last_id) + 1 if last_id.isdigit() else 0
+    return Response(progress.stream(progress_id, start), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    path = jobs.result_path(job_id)
+    if path is None:
+        return {"error": "Job has no result (unknown, expired, failed or still running)"}, 404
+    return send_file(path, as_attachment=True, download_name=jobs.status(job_id)["download_name"],
+                     mimetype=jobs.XLSX_MIMETYPE)
+
 # ---------------------------------------------------------
 # PROCESS: WARRANTY CLAIM MANAGEMENT
 # ---------------------------------------------------------
@@ -639,18 +616,21 @@ def warranty_lookup():
         customer_data = claim_processor.get_customer_records(df, mobile)
 
         if customer_data.empty:
-            return {"found": False, "message": "No records found"}, 200
+            # Offer close matches from the partial-match index (mistyped numbers)
+            suggestions = [c["mobile"] for c in claim_processor.search_mobile_candidates(mobile, limit=5)]
+            return {"found": False, "message": "No records found", "suggestions": suggestions}, 200
 
         # Extract customer name safely - prioritize "name" column
-        customer_col = claim_processor.resolve_column(df, ["name", "customer name", "customer"])
+        osid_schema = column_schema.OSID
+        customer_col = osid_schema.column(df.columns, "name")
         customer_name = str(customer_data.iloc[0].get(customer_col, "Unknown"))
 
         # Build product list
         products = []
-        invoice_col = claim_processor.resolve_column(df, ["invoice no", "invoice", "invoice_no"])
-        model_col = claim_processor.resolve_column(df, ["model"])
-        serial_col = claim_processor.resolve_column(df, ["serial no", "serialno", "serial_no"])
-        osid_col = claim_processor.resolve_column(df, ["osid"])
+        invoice_col = osid_schema.column(df.columns, "invoice")
+        model_col = osid_schema.column(df.columns, "model")
+        serial_col = osid_schema.column(df.columns, "serial")
+        osid_col = osid_schema.column(df.columns, "osid")
 
         for _, row in customer_data.iterrows():
             products.append({
@@ -706,7 +686,7 @@ def warranty_submit():
             df = claim_processor.load_excel_data()
             customer_records = claim_processor.get_customer_records(df, mobile)
             if not customer_records.empty:
-                name_col = claim_processor.resolve_column(df, ["name", "customer name", "customer"])
+                name_col = column_schema.OSID.column(df.columns, "name")
                 customer_name = str(customer_records.iloc[0].get(name_col, "Customer"))
             else:
                 customer_name = "Customer"
@@ -760,8 +740,11 @@ def warranty_submit():
                 # Cleanup temp file on error too
                 if fpath and os.path.exists(fpath):
                     os.remove(fpath)
+            finally:
+                metrics.gauge_add("osg_claim_backlog", -1)
 
         import threading
+        metrics.gauge_add("osg_claim_backlog", 1)
         threading.Thread(
             target=process_in_background,
             args=(mobile, address, selected_products, issue_desc, file_path),
@@ -789,12 +772,15 @@ def warranty_track_data():
         current_time = time.time()
         if _TRACKING_CACHE is not None and (current_time - _TRACKING_CACHE_TIME) < _TRACKING_CACHE_TTL:
             print("Serving tracking data from cache", file=sys.stderr)
+            metrics.inc("osg_cache_lookups_total", cache="tracking", result="hit")
             all_claims = _TRACKING_CACHE
         else:
+            metrics.inc("osg_cache_lookups_total", cache="tracking", result="miss")
             # Proxy the request to Google Script to avoid CORS issues on client
             import requests
             print(f"Fetching claims from: {claim_processor.WEB_APP_URL}", file=sys.stderr)
-            response = requests.get(claim_processor.WEB_APP_URL, timeout=10)
+            with metrics.timer("osg_external_call_seconds", errors="osg_external_call_errors_total", target="apps_script_fetch"):
+                response = requests.get(claim_processor.WEB_APP_URL, timeout=10)
             print(f"Response status: {response.status_code}", file=sys.stderr)
             
             if response.status_code == 200:
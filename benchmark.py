@@ -0,0 +1,247 @@
+"""
+Benchmark the report, mapping and warranty paths end to end on synthetic data.
+
+For each size, synthetic_data.generate writes (or reuses) a dataset
+directory. The runner works from inside it, so the master workbooks and the
+OSID sheet are the synthetic ones, and times:
+
+- report1           POST /process_report1 (OSG, product, previous month)
+- report2           POST /process_report2 (day sales)
+- mapping           POST /process_mapping (OSG, product)
+- warranty_lookup   POST /warranty/lookup, mean per lookup over sample customers
+- load_excel_data   cold (snapshot removed: workbook parse + snapshot build)
+                    and warm (forced reload from the snapshot)
+- get_customer_records  mean per lookup on the loaded frame
+
+All requests go through the Flask test client. The report cache is disabled
+and Report 1 gets a fresh daily store on every run, so each run does the
+full work. Results (best / median / every run, with the environment and git
+revision) are saved as JSON. --compare prints the change between two result
+files and flags regressions.
+
+Usage: python benchmark.py [--sizes 1000,10000,100000] [--repeats 3] [--data-dir DIR] [--out FILE]
+       python benchmark.py --compare old.json new.json [--threshold 0.10]
+"""
+
+import argparse
+import glob
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Every run must do the full work: no report cache, metrics kept out of the timings
+os.environ["REPORT_CACHE"] = "0"
+os.environ.setdefault("METRICS", "0")
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+LOOKUPS = 50
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(fn, repeats):
+    """Run *fn* *repeats* times; *fn* returns (seconds or None, detail dict)."""
+    runs, detail = [], {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        seconds, detail = fn()
+        runs.append(seconds if seconds is not None else time.perf_counter() - start)
+        if detail.get("error"):
+            break
+    return {"best": min(runs), "median": statistics.median(runs), "runs": runs, **detail}
+
+
+def _read(name):
+    with open(name, "rb") as fh:
+        return fh.read()
+
+
+def _post(client, url, data):
+    """POST *data* ({field: value or (bytes, filename)}) as a multipart form."""
+    form = {k: (io.BytesIO(v[0]), v[1]) if isinstance(v, tuple) else v for k, v in data.items()}
+    response = client.post(url, data=form, content_type="multipart/form-data")
+    if response.status_code != 200 or response.mimetype != XLSX:
+        return None, {"status": response.status_code, "error": response.get_data(as_text=True)[:2000]}
+    return None, {"status": response.status_code, "bytes": len(response.data)}
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def run_size(rows, stores, seed, repeats, data_dir):
+    """All benchmarks on one dataset size."""
+    import app
+    import claim_processor
+    import daily_store
+    import master_data
+
+    dataset_dir = os.path.join(data_dir, f"rows{rows}_stores{stores}_seed{seed}")
+    manifest = synthetic_data.generate(dataset_dir, rows, stores, seed)
+    previous_dir = os.getcwd()
+    os.chdir(dataset_dir)
+    try:
+        master_data.clear_cache()
+        client = app.app.test_client()
+        files = {name: _read(path) for name, path in synthetic_data.UPLOAD_FILES.items()}
+        report_date = synthetic_data.REPORT_DATE.strftime("%Y-%m-%d")
+        prev_date = synthetic_data.PREV_DATE.strftime("%Y-%m-%d")
+        results = {}
+
+        run_ids = itertools.count()
+
+        def report1():
+            # A fresh daily store per run, so every upload is aggregated in full
+            daily_store.DB_PATH = os.path.join(dataset_dir, f"daily_sales_{next(run_ids)}.sqlite")
+            return _post(client, "/process_report1", {
+                "report_date": report_date, "prev_date": prev_date,
+                "curr_osg_file": (files["osg"], "osg.xlsx"), "product_file": (files["product"], "product.xlsx"),
+                "prev_osg_file": (files["prev_osg"], "prev.xlsx")})
+
+        def remove_daily_stores():
+            for path in glob.glob(os.path.join(dataset_dir, "daily_sales_*.sqlite*")):
+                os.remove(path)
+
+        saved_db_path = daily_store.DB_PATH
+        remove_daily_stores()
+        try:
+            results["report1"] = timed(report1, repeats)
+        finally:
+            daily_store.DB_PATH = saved_db_path
+            remove_daily_stores()
+
+        results["report2"] = timed(lambda: _post(client, "/process_report2", {
+            "report_date": report_date, "time_slot": "12:30 PM", "sales_file": (files["day_sales"], "sales.xlsx")}), repeats)
+
+        results["mapping"] = timed(lambda: _post(client, "/process_mapping", {
+            "osg_file": (files["osg"], "osg.xlsx"), "product_file": (files["product"], "product.xlsx")}), repeats)
+
+        def load_cold():
+            for path in glob.glob(f"{claim_processor.EXCEL_FILE}.*.arrow") + glob.glob(f"{claim_processor.EXCEL_FILE}.*.lock"):
+                os.remove(path)
+            start = time.perf_counter()
+            df = claim_processor.load_excel_data(force_reload=True)
+            return time.perf_counter() - start, {"rows": len(df)}
+
+        def load_warm():
+            df = claim_processor.load_excel_data(force_reload=True)
+            return None, {"rows": len(df)}
+
+        results["load_excel_data_cold"] = timed(load_cold, repeats)
+        results["load_excel_data_warm"] = timed(load_warm, repeats)
+
+        mobiles = [str(m) for m in manifest["sample_mobiles"][:LOOKUPS]]
+
+        def records():
+            df = claim_processor.load_excel_data()
+            start = time.perf_counter()
+            found = sum(len(claim_processor.get_customer_records(df, m)) for m in mobiles)
+            return (time.perf_counter() - start) / len(mobiles), {"lookups": len(mobiles), "records": found}
+
+        def lookup():
+            start = time.perf_counter()
+            statuses = [client.post("/warranty/lookup", json={"mobile": m}).status_code for m in mobiles]
+            seconds = (time.perf_counter() - start) / len(mobiles)
+            bad = [s for s in statuses if s != 200]
+            return seconds, {"lookups": len(mobiles), **({"error": f"{len(bad)} lookups failed"} if bad else {})}
+
+        results["get_customer_records"] = timed(records, repeats)
+        results["warranty_lookup"] = timed(lookup, repeats)
+    finally:
+        os.chdir(previous_dir)
+        master_data.clear_cache()
+
+    return {"rows": rows, "stores": stores, "seed": seed, "files": manifest["files"], "benchmarks": results}
+
+
+def run(sizes, stores, seed, repeats, data_dir, out):
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "sizes": {},
+    }
+    for rows in sizes:
+        print(f"== {rows:,} rows ==", file=sys.stderr)
+        result = run_size(rows, stores, seed, repeats, data_dir)
+        report["sizes"][str(rows)] = result
+        for name, bench in result["benchmarks"].items():
+            status = f"  ERROR {bench['error'][:200]}" if bench.get("error") else ""
+            print(f"  {name:<22} best {bench['best']:9.4f}s  median {bench['median']:9.4f}s{status}")
+        # Save after every size, so a long run still leaves its finished sizes
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=2)
+    print(f"Results written to {out}")
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def compare(old_path, new_path, threshold):
+    """Print best-time changes between two result files; returns the regression count."""
+    with open(old_path) as fh:
+        old = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+    print(f"{old.get('git')} ({old['created']}) -> {new.get('git')} ({new['created']})")
+    regressions = 0
+    for size, result in new["sizes"].items():
+        before = old["sizes"].get(size)
+        if before is None:
+            continue
+        for name, bench in result["benchmarks"].items():
+            if name not in before["benchmarks"]:
+                continue
+            a, b = before["benchmarks"][name]["best"], bench["best"]
+            change = b / a - 1 if a else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {int(size):>9,} {name:<22} {a:9.4f}s -> {b:9.4f}s  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated upload row counts")
+    parser.add_argument("--stores", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "osg_benchmark_data"))
+    parser.add_argument("--out", default=f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    run(sizes, args.stores, args.seed, args.repeats, args.data_dir, os.path.abspath(args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark Report 1's store aggregation on synthetic uploads.
+
+Compares report_metrics.aggregate_stores (one tagged binning pass over
+store-dimension codes) with the previous chain of five groupbys and six
+left merges, checks that both produce the same frame, and prints the
+timings.
+
+Usage: python benchmark_aggregation.py [rows] [stores] [repeats]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import report_metrics
+from store_dimension import StoreDimension
+
+
+def synthetic_inputs(rows, stores, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"STORE {i:05d}" for i in range(stores)], dtype=object)
+    report_date = pd.Timestamp("2026-10-15")
+
+    def sales(month_start):
+        return pd.DataFrame({
+            'Store': rng.choice(names, rows),
+            'DATE': month_start + pd.to_timedelta(rng.integers(0, 28, rows), unit='D'),
+            'QUANTITY': rng.integers(1, 3, rows),
+            'AMOUNT': rng.integers(100, 50000, rows),
+        })
+
+    osg = sales(pd.Timestamp("2026-10-01"))
+    product = sales(pd.Timestamp("2026-10-01"))
+    prev = sales(pd.Timestamp("2026-09-01")).drop(columns='QUANTITY')
+    store_list = pd.Series(names[: int(stores * 0.9)], name='Store')
+    rbm_df = pd.DataFrame({'Store': names, 'RBM': rng.choice([f"RBM {i}" for i in range(40)], stores)})
+    return osg, product, prev, report_date, pd.Timestamp("2026-09-15"), store_list, rbm_df
+
+
+def legacy_chain(book1_df, product_df, prev_df, report_date, prev_date, store_list, rbm_df):
+    """The aggregation process_report1 used before aggregate_stores."""
+    today = pd.to_datetime(report_date)
+    mtd_df = book1_df[book1_df['DATE'].dt.month == today.month]
+    today_df = mtd_df[mtd_df['DATE'].dt.date == today.date()]
+    today_agg = today_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'FTD Count', 'AMOUNT': 'FTD Value'})
+    mtd_agg = mtd_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'MTD Count', 'AMOUNT': 'MTD Value'})
+
+    product_mtd_df = product_df[product_df['DATE'].dt.month == today.month]
+    product_today_df = product_mtd_df[product_mtd_df['DATE'].dt.date == today.date()]
+    product_today_agg = product_today_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'Product_FTD_Count', 'AMOUNT': 'Product_FTD_Amount'})
+    product_mtd_agg = product_mtd_df.groupby('Store', as_index=False).agg({'QUANTITY': 'sum', 'AMOUNT': 'sum'}).rename(columns={'QUANTITY': 'Product_MTD_Count', 'AMOUNT': 'Product_MTD_Amount'})
+
+    prev_month = pd.to_datetime(prev_date)
+    prev_mtd_df = prev_df[prev_df['DATE'].dt.month == prev_month.month]
+    prev_mtd_agg = prev_mtd_df.groupby('Store', as_index=False).agg({'AMOUNT': 'sum'}).rename(columns={'AMOUNT': 'PREV MONTH SALE'})
+
+    all_stores_list = pd.concat([store_list, book1_df['Store'], product_df['Store']]).unique()
+    all_stores = pd.DataFrame(all_stores_list, columns=['Store'])
+    return all_stores.merge(today_agg, on='Store', how='left') \
+                     .merge(mtd_agg, on='Store', how='left') \
+                     .merge(product_today_agg, on='Store', how='left') \
+                     .merge(product_mtd_agg, on='Store', how='left') \
+                     .merge(prev_mtd_agg, on='Store', how='left') \
+                     .merge(rbm_df, on='Store', how='left')
+
+
+def encoded(osg, product, prev, report_date, prev_date, store_list, rbm_df):
+    """The same inputs with every Store column encoded against one dimension."""
+    osg, product, prev = osg.copy(), product.copy(), prev.copy()
+    store_list, rbm_stores, osg['Store'], product['Store'], prev['Store'] = StoreDimension(
+        store_list, rbm_df['Store']).encode(store_list, rbm_df['Store'], osg['Store'], product['Store'], prev['Store'])
+    return osg, product, prev, report_date, prev_date, store_list, rbm_df.assign(Store=rbm_stores)
+
+
+def encoded_aggregate(*args):
+    """Encode the Store columns, then aggregate: the whole cost of the new path."""
+    return report_metrics.aggregate_stores(*encoded(*args))
+
+
+def best_of(fn, args, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    stores = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    args = synthetic_inputs(rows, stores)
+
+    legacy_time, legacy = best_of(legacy_chain, args, repeats)
+    encode_time, encoded_args = best_of(encoded, args, repeats)
+    aggregate_time, _ = best_of(report_metrics.aggregate_stores, encoded_args, repeats)
+    new_time, new = best_of(encoded_aggregate, args, repeats)
+    new['Store'] = new['Store'].astype(object)
+
+    ints = [c for c in legacy.columns if c not in ('Store', 'RBM')]
+    pd.testing.assert_frame_equal(
+        legacy[['Store', 'RBM']], new[['Store', 'RBM']], check_dtype=False)
+    pd.testing.assert_frame_equal(
+        legacy[ints].fillna(0).astype(int), new[ints].fillna(0).astype(int))
+
+    print(f"rows per upload: {rows:,} | stores: {stores:,} | best of {repeats}")
+    print(f"  merge chain       : {legacy_time:.3f}s")
+    print(f"  encode            : {encode_time:.3f}s")
+    print(f"  aggregate_stores  : {aggregate_time:.3f}s")
+    print(f"  encode + aggregate: {new_time:.3f}s  ({legacy_time / new_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,15 +27,22 @@ from datetime import datetime
 from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from collections import namedtuple
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+import numpy as np
 import pandas as pd
 import pytz
 import requests
 import smtplib
 import threading
 
+import metrics
+import osid_snapshot
+from column_schema import OSID, normalise_header
+from mobile_numbers import mobile_keys
+
 # ---------------------------------------------------------------------------
 # Configuration – copy from the original Streamlit script
 # ---------------------------------------------------------------------------
@@ -52,6 +59,24 @@ SENDER_EMAIL = "jasil@myg.in"
 SENDER_PASSWORD = "vurw qnwv ynys xkrf"
 WEB_APP_URL = "https://script.google.com/macros/s/AKfycby48-irQy37Eq_SQKJSpv70xiBFyajtR5ScIBfeRclnvYqAMv4eVCtJLZ87QUJADqXt/exec"
 
+# Column variants (after header normalisation) used by the warranty flow,
+# declared in column_schema.OSID. Only these columns are read from the OSID
+# workbook.
+NAME_COLUMNS = OSID.aliases("name")
+MOBILE_COLUMNS = OSID.aliases("mobile")
+INVOICE_COLUMNS = OSID.aliases("invoice")
+MODEL_COLUMNS = OSID.aliases("model")
+SERIAL_COLUMNS = OSID.aliases("serial")
+OSID_COLUMNS = OSID.aliases("osid")
+WARRANTY_COLUMNS = set(
+    NAME_COLUMNS + MOBILE_COLUMNS + INVOICE_COLUMNS + MODEL_COLUMNS + SERIAL_COLUMNS + OSID_COLUMNS
+)
+
+# Set OSID_SHARED_DATASET=1 when running several gunicorn workers: the OSID
+# frame and indexes then stay in the memory-mapped snapshot, shared by every
+# worker, instead of a private copy per process.
+SHARED_DATASET = os.environ.get("OSID_SHARED_DATASET", "0") == "1"
+
 # ---------------------------------------------------------------------------
 # Helper utilities (mirroring the Streamlit helpers)
 # ---------------------------------------------------------------------------
@@ -86,12 +111,259 @@ def format_ist_datetime(dt_str: Any) -> str:
 # Core data handling
 # ---------------------------------------------------------------------------
 
-# Global cache for the dataframe and mobile index
+# Everything derived from one load of the workbook. It is swapped in a single
+# assignment so concurrent lookups never pair a frame with another load's index.
+#   mobile_index: (sorted int64 mobile keys, row positions); rows without a
+#                 numeric mobile sort first under key -1.
+#   ngrams:       trigram inverted index over the distinct keys
+#                 (distinct keys, per-trigram offsets, key ids grouped by trigram).
+#   table:        memory-mapped Arrow table behind the frame in shared mode.
+_Dataset = namedtuple("_Dataset", ["frame", "mobile_index", "ngrams", "table"])
+
+# Global cache for the dataframe and its indexes
 _DF_CACHE = None
 _DF_CACHE_TIME = 0
-_MOBILE_INDEX = None
+_DATASET = None
+_INDEX_NAMES = ("mobile", "mobile_ngram")
+NGRAM = 3
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
 _LOAD_LOCK = threading.Lock()
 
+
+def _read_osid_workbook(path: str) -> pd.DataFrame:
+    """Parse only the warranty columns of the OSID workbook.
+
+    Mixed-type object columns are stored as text (missing values kept) so the
+    frame round-trips through the columnar snapshot unchanged; every consumer
+    stringifies these values anyway.
+    """
+    df = pd.read_excel(path, usecols=lambda c: normalise_header(c) in WARRANTY_COLUMNS)
+    df.columns = [normalise_header(c) for c in df.columns]
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col]) or df[col].dtype == object:
+            df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+
+
+def _build_mobile_index(df: pd.DataFrame) -> tuple:
+    """Build the ``(sorted keys, row positions)`` mobile index in one bulk step."""
+    keys = mobile_keys(df[OSID.column(df.columns, "mobile")])
+    # Stable sort keeps rows of the same mobile in sheet order
+    rows = np.argsort(keys, kind="stable")
+    return keys[rows], rows
+
+
+def _distinct_keys(sorted_keys: np.ndarray) -> np.ndarray:
+    """Distinct non-negative keys of an already sorted key array."""
+    keyed = sorted_keys[np.searchsorted(sorted_keys, 0):]
+    if len(keyed) == 0:
+        return keyed
+    return keyed[np.r_[True, keyed[1:] != keyed[:-1]]]
+
+
+def _build_mobile_ngrams(sorted_keys: np.ndarray) -> tuple:
+    """Return every distinct ``(trigram, key id)`` pair, ordered by trigram.
+
+    A trigram is three consecutive digits of a key's decimal form, encoded as
+    an int in ``0..999``. Keys are grouped by digit count so the trigrams of a
+    whole group come out of integer division instead of string slicing.
+    """
+    distinct = _distinct_keys(sorted_keys)
+    widths = np.searchsorted(_POW10, np.maximum(distinct, 1), side="right")
+    grams, key_ids = [], []
+    for width in np.unique(widths):
+        ids = np.flatnonzero(widths == width)
+        for shift in range(int(width) - NGRAM, -1, -1):
+            grams.append((distinct[ids] // _POW10[shift]) % 10 ** NGRAM)
+            key_ids.append(ids)
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.sort(np.concatenate(grams) * len(distinct) + np.concatenate(key_ids))
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]
+    return pairs // len(distinct), pairs % len(distinct)
+
+
+def _ngram_index(sorted_keys: np.ndarray, grams: np.ndarray, key_ids: np.ndarray) -> tuple:
+    """Assemble the trigram index from the persisted trigram postings."""
+    offsets = np.searchsorted(grams, np.arange(10 ** NGRAM + 1))
+    return _distinct_keys(sorted_keys), offsets, key_ids
+
+
+def _ngram_candidates(dataset: _Dataset, mobile: str) -> Optional[tuple]:
+    """Distinct-key ids sharing trigrams with *mobile*, with shared counts.
+
+    Returns ``(key ids, shared trigram counts, query trigram count)`` or
+    ``None`` when *mobile* is too short to index.
+    """
+    if not mobile.isdigit() or len(mobile) < NGRAM:
+        return None
+    _, offsets, key_ids = dataset.ngrams
+    query = np.unique([int(mobile[i:i + NGRAM]) for i in range(len(mobile) - NGRAM + 1)])
+    postings = np.concatenate([key_ids[offsets[g]:offsets[g + 1]] for g in query])
+    ids, counts = np.unique(postings, return_counts=True)
+    return ids, counts, len(query)
+
+
+def _lookup_mobile_rows(dataset: _Dataset, mobile: str) -> Optional[np.ndarray]:
+    """Row positions of *mobile* in the cached frame, or ``None`` if not indexed."""
+    if not mobile.isdigit() or mobile.startswith("0"):
+        return None
+    sorted_keys, rows = dataset.mobile_index
+    key = int(mobile)
+    lo = np.searchsorted(sorted_keys, key, side="left")
+    hi = np.searchsorted(sorted_keys, key, side="right")
+    return rows[lo:hi] if hi > lo else None
+
+
+def _match_mobile_rows(dataset: _Dataset, mobile_col: str, mobile: str) -> Optional[np.ndarray]:
+    """Strict-then-substring matches for *mobile* in the cached frame.
+
+    Equivalent to the linear ``== mobile`` / ``str.contains(mobile)`` scans,
+    but numeric mobiles are searched through the trigram index and only the
+    few rows without a numeric key are scanned. Returns ``None`` when the
+    query cannot use the index.
+    """
+    candidates = _ngram_candidates(dataset, mobile)
+    if candidates is None:
+        return None
+    sorted_keys, rows = dataset.mobile_index
+    unkeyed = rows[:np.searchsorted(sorted_keys, 0)]
+    unkeyed_values = dataset.frame[mobile_col].iloc[unkeyed].astype(str)
+
+    # Strict match – numeric keys were already tried by the exact index
+    strict = unkeyed[(unkeyed_values.str.strip() == mobile).to_numpy()]
+    if len(strict):
+        return np.sort(strict)
+
+    # Partial match – every query trigram must be shared, then confirm the substring
+    ids, counts, n_query = candidates
+    distinct = dataset.ngrams[0]
+    keys = distinct[ids[counts == n_query]]
+    keys = np.array([k for k in keys if mobile in str(k)], dtype=np.int64)
+    lo = np.searchsorted(sorted_keys, keys, side="left")
+    hi = np.searchsorted(sorted_keys, keys, side="right")
+    matched = [rows[a:b] for a, b in zip(lo, hi)]
+    matched.append(unkeyed[unkeyed_values.str.contains(mobile, na=False).to_numpy()])
+    return np.sort(np.concatenate(matched))
+
+
+def _take_rows(dataset: _Dataset, rows: np.ndarray) -> pd.DataFrame:
+    """Materialise *rows* of the cached frame as an ordinary pandas frame.
+
+    In shared mode only the selected rows are copied out of the mapped table.
+    """
+    if dataset.table is None:
+        return dataset.frame.iloc[rows]
+    records = osid_snapshot.to_pandas(dataset.table.take(rows))
+    records.index = rows
+    return records
+
+
+def search_mobile_candidates(mobile: str, limit: int = 10, min_score: float = 0.5) -> List[Dict[str, Any]]:
+    """Rank indexed mobile numbers that contain or resemble *mobile*.
+
+    ``score`` is the fraction of the query's trigrams found in the candidate,
+    so a number with one mistyped digit still scores well. Candidates that
+    contain the query verbatim rank first, then by score, then by how many
+    digits agree position by position, then by how close their length is to
+    the query.
+    """
+    dataset = _DATASET
+    mobile = str(mobile).strip()
+    candidates = _ngram_candidates(dataset, mobile) if dataset is not None else None
+    if candidates is None:
+        return []
+    ids, counts, n_query = candidates
+    keep = counts >= max(1, int(np.ceil(min_score * n_query)))
+    distinct = dataset.ngrams[0]
+    ranked = []
+    for key, shared in zip(distinct[ids[keep]], counts[keep]):
+        text = str(key)
+        ranked.append({
+            "mobile": text,
+            "score": round(float(shared) / n_query, 2),
+            "substring": bool(shared == n_query and mobile in text),
+            "_aligned": sum(a == b for a, b in zip(text, mobile)),
+        })
+    ranked.sort(key=lambda c: (
+        not c["substring"], -c["score"], -c["_aligned"], abs(len(c["mobile"]) - len(mobile)), c["mobile"]
+    ))
+    for c in ranked:
+        del c["_aligned"]
+    return ranked[:limit]
+
+
+def _build_snapshot_source(path: str) -> tuple:
+    """Parse the workbook and build its indexes; returns ``(frame, indexes)``."""
+    print(f"Loading Excel data from {path}...", file=sys.stderr)
+    df = _read_osid_workbook(path)
+
+    # Build high-speed indexes for exact and partial mobile lookups
+    print("Building high-speed mobile index...", file=sys.stderr)
+    sorted_keys, rows = _build_mobile_index(df)
+    grams, key_ids = _build_mobile_ngrams(sorted_keys)
+    return df, {
+        "mobile": {"key": sorted_keys, "row": rows},
+        "mobile_ngram": {"gram": grams, "key_id": key_ids},
+    }
+
+
+def _dataset_from_indexes(df: pd.DataFrame, mobile: tuple, ngram: tuple, table: Any = None) -> _Dataset:
+    return _Dataset(df, mobile, _ngram_index(mobile[0], *ngram), table)
+
+
+def _load_dataset(path: str) -> _Dataset:
+    """Load the workbook's dataset from its snapshot, building it if stale.
+
+    The build runs under a cross-process lock: when several workers start
+    together, one parses the workbook and the rest attach to its snapshot.
+    """
+    snapshot = osid_snapshot.read_snapshot(path, _INDEX_NAMES, zero_copy=SHARED_DATASET)
+    if snapshot is None:
+        with osid_snapshot.build_lock(path):
+            # Another worker may have finished the build while we waited
+            snapshot = osid_snapshot.read_snapshot(path, _INDEX_NAMES, zero_copy=SHARED_DATASET)
+            if snapshot is None:
+                df, indexes = _build_snapshot_source(path)
+                written = osid_snapshot.write_snapshot(path, df, indexes)
+                if not (SHARED_DATASET and written):
+                    return _dataset_from_indexes(
+                        df,
+                        (indexes["mobile"]["key"], indexes["mobile"]["row"]),
+                        (indexes["mobile_ngram"]["gram"], indexes["mobile_ngram"]["key_id"]),
+                    )
+                # Shared mode: drop the private copy and attach to the snapshot
+                snapshot = osid_snapshot.read_snapshot(path, _INDEX_NAMES, zero_copy=True)
+                if snapshot is None:
+                    raise RuntimeError(f"Snapshot for '{path}' vanished right after it was written")
+
+    print(f"Loading Excel data from snapshot {osid_snapshot.snapshot_path(path)}...", file=sys.stderr)
+    df, indexes, table = snapshot
+    mobile, ngram = indexes["mobile"], indexes["mobile_ngram"]
+    return _dataset_from_indexes(
+        df,
+        (mobile.column("key").to_numpy(), mobile.column("row").to_numpy()),
+        (ngram.column("gram").to_numpy(), ngram.column("key_id").to_numpy()),
+        table if SHARED_DATASET else None,
+    )
+
+
+def prepare_snapshot(path: str = EXCEL_FILE) -> bool:
+    """Make sure a fresh snapshot of *path* exists without caching it here.
+
+    Meant for a pre-fork hook (see ``gunicorn.conf.py``) so the workbook is
+    parsed once before any worker starts. Returns ``True`` if a snapshot is
+    available afterwards.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Excel file not found at: {path}")
+    with osid_snapshot.build_lock(path):
+        if osid_snapshot.read_snapshot(path, _INDEX_NAMES, zero_copy=True) is not None:
+            return True
+        df, indexes = _build_snapshot_source(path)
+        return osid_snapshot.write_snapshot(path, df, indexes)
+
+
 def load_excel_data(path: str = EXCEL_FILE, force_reload: bool = False) -> pd.DataFrame:
     """Load the Excel workbook and normalise column names.
     
@@ -99,13 +371,19 @@ def load_excel_data(path: str = EXCEL_FILE, force_reload: bool = False) -> pd.Da
     Reloads if the file has changed or if force_reload is True.
     Also builds a hash map index for O(1) mobile number lookups.
     Thread-safe to prevent race conditions.
+
+    Cold loads are served from the columnar snapshot written by
+    ``osid_snapshot`` when it matches the workbook; the xlsx is only parsed
+    (and the snapshot refreshed) when the workbook has changed. With
+    ``SHARED_DATASET`` the returned frame is backed by the shared snapshot.
     """
-    global _DF_CACHE, _DF_CACHE_TIME, _MOBILE_INDEX
+    global _DF_CACHE, _DF_CACHE_TIME, _DATASET
     
     # Fast check without lock first
     if _DF_CACHE is not None and not force_reload:
         try:
             if os.path.exists(path) and os.path.getmtime(path) <= _DF_CACHE_TIME:
+                metrics.inc("osg_cache_lookups_total", cache="osid_frame", result="hit")
                 return _DF_CACHE
         except:
             pass # Fall through to full check
@@ -125,45 +403,21 @@ def load_excel_data(path: str = EXCEL_FILE, force_reload: bool = False) -> pd.Da
             
             # Double-check cache inside lock
             if _DF_CACHE is not None and not force_reload and file_mtime <= _DF_CACHE_TIME:
+                metrics.inc("osg_cache_lookups_total", cache="osid_frame", result="hit")
                 return _DF_CACHE
                 
-            # Load data
-            print(f"Loading Excel data from {path}...", file=sys.stderr)
+            metrics.inc("osg_cache_lookups_total", cache="osid_frame", result="miss")
             start_time = time.time()
-            
-            # Optimization: Read as string for mobile/serial to avoid conversion overhead later
-            # We can't know exact column names yet, so we read all, but we can try to be efficient
-            df = pd.read_excel(path)
-            
-            df.columns = (
-                df.columns.astype(str)
-                .str.strip()
-                .str.replace("\u00A0", " ")
-                .str.lower()
-                .str.replace(r"\s+", " ", regex=True)
-            )
-            
-            # Build high-speed index for mobile numbers
-            print("Building high-speed mobile index...", file=sys.stderr)
-            mobile_col = resolve_column(df, ["mobile no", "mobile", "mobile_no", "mobile no rf"])
-            
-            # Create a dictionary mapping mobile -> list of indices
-            _MOBILE_INDEX = {}
-            
-            # Convert to string, strip whitespace and decimals
-            mobiles = df[mobile_col].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-            
-            for idx, mob in mobiles.items():
-                if mob not in _MOBILE_INDEX:
-                    _MOBILE_INDEX[mob] = []
-                _MOBILE_INDEX[mob].append(idx)
-                
-            # Update cache
-            _DF_CACHE = df
+            dataset = _load_dataset(path)
+            metrics.observe("osg_osid_load_seconds", time.time() - start_time)
+
+            # Update cache – the dataset first, so the frame is never newer than its index
+            _DATASET = dataset
+            _DF_CACHE = dataset.frame
             _DF_CACHE_TIME = file_mtime
             print(f"Data loaded and indexed in {time.time() - start_time:.2f}s", file=sys.stderr)
             
-            return df
+            return dataset.frame
         except Exception as exc:
             # Log the full error to help debugging on server
             import traceback
@@ -171,47 +425,37 @@ def load_excel_data(path: str = EXCEL_FILE, force_reload: bool = False) -> pd.Da
             raise RuntimeError(f"Failed to read Excel file '{path}': {exc}")
 
 
-def resolve_column(df: pd.DataFrame, variants: List[str]) -> str:
-    """Return the first matching column name from *variants*.
-
-    If none match, the function returns the first variant (so downstream code can
-    still attempt a lookup and raise a clear error).
-    """
-    for v in variants:
-        if v in df.columns:
-            return v
-    return variants[0]
-
-
 def get_customer_records(df: pd.DataFrame, mobile: str) -> pd.DataFrame:
     """Filter the dataframe for rows matching the given mobile number.
 
-    Uses the pre-built hash index for instant lookups if available.
-    Falls back to linear scan if index is missing or for partial matches.
+    Uses the pre-built sorted mobile index (binary search) for exact matches
+    and the trigram index for partial matches when querying the cached frame.
+    Falls back to linear scan for other frames or unindexable queries.
     """
-    global _MOBILE_INDEX, _DF_CACHE
-    
     mobile = str(mobile).strip()
-    mobile_col = resolve_column(
-        df, ["mobile no", "mobile", "mobile_no", "mobile no rf"]
-    )
+    mobile_col = OSID.column(df.columns, "mobile")
     
-    # FAST PATH: Use index if we are querying the cached dataframe
-    if df is _DF_CACHE and _MOBILE_INDEX is not None:
-        if mobile in _MOBILE_INDEX:
-            indices = _MOBILE_INDEX[mobile]
-            return df.loc[indices]
+    # FAST PATH: Use indexes if we are querying the cached dataframe
+    dataset = _DATASET
+    if dataset is not None and df is dataset.frame:
+        rows = _lookup_mobile_rows(dataset, mobile)
+        if rows is None:
+            rows = _match_mobile_rows(dataset, mobile_col, mobile)
+        if rows is not None:
+            return _take_rows(dataset, rows)
             
     # SLOW PATH: Linear scan (fallback)
     try:
         # Strict match
-        filtered = df[df[mobile_col].astype(str).str.strip() == mobile]
+        mask = df[mobile_col].astype(str).str.strip() == mobile
         
         # Partial match fallback (only if strict match fails)
-        if filtered.empty:
-            filtered = df[df[mobile_col].astype(str).str.contains(mobile, na=False)]
-            
-        return filtered
+        if not mask.any():
+            mask = df[mobile_col].astype(str).str.contains(mobile, na=False)
+
+        if dataset is not None and df is dataset.frame:
+            return _take_rows(dataset, np.flatnonzero(mask.to_numpy(dtype=bool, na_value=False)))
+        return df[mask]
     except KeyError as exc:
         raise RuntimeError(f"Column '{mobile_col}' not found in Excel data: {exc}")
 
@@ -294,10 +538,11 @@ def send_email(
             msg.attach(part)
 
     recipients = [TARGET_EMAIL] + CC_EMAILS
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10) as server:
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, recipients, msg.as_string())
+    with metrics.timer("osg_external_call_seconds", errors="osg_external_call_errors_total", target="smtp"):
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10) as server:
+            server.starttls()
+            server.login(SENDER_EMAIL, SENDER_PASSWORD)
+            server.sendmail(SENDER_EMAIL, recipients, msg.as_string())
 
 # ---------------------------------------------------------------------------
 # Google Sheets / HTTP endpoint submission
@@ -309,7 +554,10 @@ def submit_claim(payload: Dict[str, Any]) -> bool:
     Returns ``True`` if the request succeeded (status code 200) else ``False``.
     """
     try:
-        response = requests.post(WEB_APP_URL, json=payload, timeout=8)
+        with metrics.timer("osg_external_call_seconds", errors="osg_external_call_errors_total", target="apps_script_submit"):
+            response = requests.post(WEB_APP_URL, json=payload, timeout=8)
+        if response.status_code != 200:
+            metrics.inc("osg_external_call_errors_total", target="apps_script_submit")
         return response.status_code == 200
     except Exception as exc:
         print(f"Error submitting claim to endpoint: {exc}", file=sys.stderr)
@@ -393,7 +641,7 @@ def process_claim(
         df = load_excel_data()
         customer_records = get_customer_records(df, mobile)
         if not customer_records.empty:
-            name_col = resolve_column(df, ["name", "customer name", "customer"])
+            name_col = OSID.column(df.columns, "name")
             customer_name = str(customer_records.iloc[0].get(name_col, "Customer"))
         else:
             customer_name = "Customer"
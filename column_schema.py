@@ -0,0 +1,206 @@
+# column_schema.py
+"""Declared column layouts for every workbook the app reads.
+
+Each input kind (OSG sales export, product sales export, Onsitego OSID
+sheet, ...) is a ``Schema``: an ordered list of logical fields, each with the
+header aliases it may appear under. ``Schema.resolve`` maps a header to a
+``Resolution`` in one pass:
+
+- ``renames``  – {original label: field name}, ready for ``DataFrame.rename``.
+- ``columns``  – {field name: original label} for the fields found.
+- ``missing``  – required fields with no matching column.
+
+Headers are compared after ``normalise_header`` (trimmed, lower-cased,
+whitespace collapsed). Fields are resolved in declaration order and the
+first alias present wins; a column is never claimed by two fields.
+Resolutions are memoized on the exact header tuple, so repeat uploads with
+the same layout skip resolution entirely.
+"""
+
+import functools
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Sequence
+
+import pandas as pd
+
+Field = namedtuple("Field", ["name", "aliases", "contains"], defaults=((), ()))
+Resolution = namedtuple("Resolution", ["renames", "columns", "missing"])
+
+
+def normalise_header(name: Any) -> str:
+    """Normalise a workbook header the same way for every schema."""
+    return " ".join(str(name).strip().replace("\u00A0", " ").lower().split())
+
+
+class SchemaError(ValueError):
+    """An input is missing required columns.
+
+    ``missing`` lists every required field that could not be resolved and
+    ``available`` the header that was searched.
+    """
+
+    def __init__(self, schema: "Schema", missing: List[str], available: List[Any]):
+        self.kind = schema.kind
+        self.missing = missing
+        self.available = available
+        details = "; ".join(f"{name} (looked for: {', '.join(schema.aliases(name))})" for name in missing)
+        super().__init__(
+            f"{schema.kind} file is missing required column(s): {details}. "
+            f"Available columns: {[str(c) for c in available]}"
+        )
+
+
+class Schema:
+    """Logical fields of one input kind and the headers they may appear under.
+
+    A field matches a column whose normalised header equals one of its
+    ``aliases`` or, failing that, contains one of its ``contains`` fragments.
+    """
+
+    def __init__(self, kind: str, fields: Sequence[Field], required: Iterable[str] = ()):
+        self.kind = kind
+        self.fields = list(fields)
+        self.required = list(required)
+        self._by_name = {f.name: f for f in self.fields}
+
+    def aliases(self, name: str) -> List[str]:
+        """Header aliases of field *name*, in priority order."""
+        field = self._by_name[name]
+        return list(field.aliases) + [f"*{c}*" for c in field.contains]
+
+    def resolve(self, header: Iterable[Any]) -> Resolution:
+        """Resolve *header* (memoized by the header tuple)."""
+        return _resolve(self, tuple(header))
+
+    def renames(self, header: Iterable[Any]) -> Dict[Any, str]:
+        """{original label: field name} for *header*."""
+        return self.resolve(header).renames
+
+    def column(self, header: Iterable[Any], name: str) -> Any:
+        """Label of field *name* in *header*, else its first alias.
+
+        The fallback lets callers use ``row.get(label, default)`` on frames
+        that lack the field.
+        """
+        return self.resolve(header).columns.get(name, self._by_name[name].aliases[0])
+
+    def require(self, header: Iterable[Any]) -> Resolution:
+        """Like ``resolve`` but raises ``SchemaError`` if a required field is missing."""
+        header = tuple(header)
+        resolution = _resolve(self, header)
+        if resolution.missing:
+            raise SchemaError(self, resolution.missing, list(header))
+        return resolution
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Return *df* with its columns renamed to field names.
+
+        Raises ``SchemaError`` listing every missing required field.
+        """
+        renames = self.require(df.columns).renames
+        return df.rename(columns=renames) if renames else df
+
+    def __repr__(self):
+        return f"Schema({self.kind!r})"
+
+
+@functools.lru_cache(maxsize=512)
+def _resolve(schema: Schema, header: tuple) -> Resolution:
+    normalised = {}
+    for col in header:
+        normalised.setdefault(normalise_header(col), col)
+
+    columns: Dict[str, Any] = {}
+    claimed = set()
+    for field in schema.fields:
+        match = None
+        for alias in field.aliases:
+            col = normalised.get(alias)
+            if col is not None and col not in claimed:
+                match = col
+                break
+        if match is None and field.contains:
+            for key, col in normalised.items():
+                if col not in claimed and any(fragment in key for fragment in field.contains):
+                    match = col
+                    break
+        if match is not None:
+            columns[field.name] = match
+            claimed.add(match)
+
+    renames = {col: name for name, col in columns.items() if col != name}
+    missing = [name for name in schema.required if name not in columns]
+    return Resolution(renames, columns, missing)
+
+# ---------------------------------------------------------------------------
+# Report uploads
+# ---------------------------------------------------------------------------
+
+_STORE = ("store", "store name", "branch", "branch name", "outlet")
+
+OSG_SALES = Schema("OSG", [
+    Field("DATE", ("date",)),
+    Field("QUANTITY", ("quantity", "qty")),
+    Field("BILLED_QTY", contains=("billed",)),
+    Field("AMOUNT", ("amount",)),
+    Field("Store", _STORE),
+], required=["DATE", "AMOUNT", "Store"])
+
+PRODUCT_SALES = Schema("Product", [
+    Field("Store", _STORE),
+    Field("DATE", ("date",)),
+    Field("AMOUNT", ("sold price", "amount", "price")),
+    Field("QUANTITY", ("quantity", "qty")),
+], required=["Store", "DATE", "AMOUNT"])
+
+PREV_OSG_SALES = Schema("Previous month OSG", [
+    Field("Store", _STORE),
+    Field("DATE", ("date",)),
+    Field("AMOUNT", ("amount",)),
+    Field("QUANTITY", ("quantity", "qty")),
+], required=["Store", "DATE", "AMOUNT"])
+
+DAY_SALES = Schema("Sales", [
+    Field("Store", _STORE),
+    Field("QUANTITY", ("quantity", "qty")),
+    Field("AMOUNT", ("amount",)),
+], required=["Store", "QUANTITY", "AMOUNT"])
+
+# ---------------------------------------------------------------------------
+# OSG ↔ product mapping uploads
+# ---------------------------------------------------------------------------
+
+_MOBILE = ("customer mobile", "mobile", "mobile no", "customer mobile no", "phone")
+_DATE = ("date", "invoice date")
+
+MAPPING_OSG = Schema("OSG", [
+    Field("Customer Mobile", _MOBILE),
+    Field("Retailer SKU", ("retailer sku", "sku", "plan sku", "plan name", "item name")),
+    Field("Plan Price", ("plan price", "amount", "price")),
+    Field("DATE", _DATE),
+    Field("Store", ("store", "branch")),
+], required=["Customer Mobile", "Retailer SKU"])
+
+MAPPING_PRODUCT = Schema("Product", [
+    Field("Customer Mobile", _MOBILE),
+    Field("Category", ("category", "product category", "item category")),
+    Field("Model", ("model", "model name", "item name")),
+    Field("Brand", ("brand",)),
+    Field("IMEI", ("imei", "serial no", "imei/serial no", "serial number")),
+    Field("Sold Price", ("sold price", "amount", "price")),
+    Field("Invoice Number", ("invoice number", "invoice no", "invoice")),
+    Field("DATE", _DATE),
+], required=["Customer Mobile", "Category"])
+
+# ---------------------------------------------------------------------------
+# Onsitego OSID sheet (warranty lookups)
+# ---------------------------------------------------------------------------
+
+OSID = Schema("OSID", [
+    Field("name", ("name", "customer name", "customer")),
+    Field("mobile", ("mobile no", "mobile", "mobile_no", "mobile no rf")),
+    Field("invoice", ("invoice no", "invoice", "invoice_no")),
+    Field("model", ("model",)),
+    Field("serial", ("serial no", "serialno", "serial_no")),
+    Field("osid", ("osid",)),
+], required=["mobile"])
@@ -0,0 +1,263 @@
+# daily_store.py
+"""Persistent per-store, per-day sales aggregates for Report 1.
+
+Report 1 used to need the whole month-to-date OSG and product exports on
+every run. Each upload is now reduced to one row per (source, store, day),
+and the result is upserted into a local SQLite table:
+
+    daily_sales(source, store_key, day, store, quantity, amount, rows)
+
+- ``source``    – ``"osg"``, ``"product"`` or ``"prev_osg"`` (previous-month
+  OSG uploads, kept apart from the current-month OSG days).
+- ``store_key`` – ``store_dimension.canonical_key`` of the store.
+- ``day``       – ISO date.
+- ``store``     – the spelling last uploaded, used as the display name.
+
+An upload replaces exactly the days it contains for its source, so
+re-uploading a corrected day, or the whole month, is always safe. Only the
+rows of the upload's own month are stored (the report month for OSG and
+product uploads, the previous month for previous-month uploads); stray rows
+of other months never replace stored days. The report then reads the report
+month back from the table. Uploading only today's rows therefore still gives
+full MTD figures.
+
+Previous-month figures come from the previous-month upload when there is
+one. Without it they are read from the table: the stored previous-month
+upload of that month if any, otherwise that month's stored OSG days.
+
+A bad day or month is removed with ``clear`` or from the command line:
+
+    python daily_store.py --clear-month 2026-09 [--source osg]
+    python daily_store.py --clear-day 2026-10-15
+
+Uploads without a quantity column (previous-month files may omit it) store
+NULL quantities, which read back as 0.
+
+Every upsert that changes stored rows bumps the revision. ``version``
+returns it together with a random id created with the database, so results
+derived from the table (e.g. cached reports) can be keyed on it: a deleted
+and recreated database starts again at revision 0 but never matches them.
+
+The store is on by default, so Report 1 figures include every earlier
+upload kept in it. It lives in ``DAILY_STORE_PATH``, by default
+``daily_sales.sqlite`` next to this module (not the working directory);
+the path is logged whenever a connection to it is opened. Set
+``DAILY_STORE=0`` to disable the store; Report 1 then aggregates the
+uploads alone, as before.
+"""
+
+import argparse
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from store_dimension import canonical_key
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+DB_PATH = os.path.abspath(os.environ.get(
+    "DAILY_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "daily_sales.sqlite")))
+ENABLED = os.environ.get("DAILY_STORE", "1") == "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_sales (
+    source    TEXT NOT NULL,
+    store_key TEXT NOT NULL,
+    day       TEXT NOT NULL,
+    store     TEXT NOT NULL,
+    quantity  REAL,
+    amount    REAL NOT NULL,
+    rows      INTEGER NOT NULL,
+    PRIMARY KEY (source, day, store_key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('revision', 0);
+"""
+
+_LOCAL = threading.local()
+
+# ---------------------------------------------------------------------------
+# Connection
+# ---------------------------------------------------------------------------
+
+def _connect() -> sqlite3.Connection:
+    """This thread's connection to ``DB_PATH`` (created with the schema on first use).
+
+    Keyed on the pid too: a connection inherited across a fork is never reused.
+    """
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None or getattr(_LOCAL, "key", None) != (os.getpid(), DB_PATH):
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        with conn:
+            # Identifies this database file for its whole life (see ``version``)
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('store_id', ?)", [secrets.randbits(62)])
+        print(f"Daily store: {os.path.abspath(DB_PATH)}", file=sys.stderr)
+        _LOCAL.conn, _LOCAL.key = conn, (os.getpid(), DB_PATH)
+    return conn
+
+
+def version() -> Optional[Tuple[int, int]]:
+    """``(store id, revision)`` of the stored data, or ``None`` when the store is disabled."""
+    if not ENABLED:
+        return None
+    values = dict(_connect().execute("SELECT name, value FROM meta WHERE name IN ('store_id', 'revision')"))
+    return values["store_id"], values["revision"]
+
+# ---------------------------------------------------------------------------
+# Upsert
+# ---------------------------------------------------------------------------
+
+def _daily_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """*df* (``Store``, ``DATE``, ``AMOUNT`` and optionally ``QUANTITY``) summed per store and day."""
+    codes, uniques = pd.factorize(df["Store"])
+    keys = np.array([canonical_key(v) for v in uniques] + [None], dtype=object)[codes]
+    frame = pd.DataFrame({
+        "store_key": keys,
+        "day": df["DATE"].dt.strftime("%Y-%m-%d").to_numpy(),
+        "store": df["Store"].astype(object).to_numpy(),
+        "quantity": pd.to_numeric(df["QUANTITY"], errors="coerce").to_numpy(float) if "QUANTITY" in df.columns else np.nan,
+        "amount": pd.to_numeric(df["AMOUNT"], errors="coerce").to_numpy(float),
+    }).dropna(subset=["store_key", "day"])
+    grouped = frame.groupby(["day", "store_key"], sort=True)
+    daily = grouped.agg(store=("store", "last"), amount=("amount", "sum"), rows=("amount", "size"))
+    daily["quantity"] = grouped["quantity"].sum(min_count=1)
+    daily = daily.reset_index()
+    daily["store"] = daily["store"].astype(str)
+    return daily
+
+
+def _records(df: pd.DataFrame):
+    return [(r.day, r.store_key, r.store, None if pd.isna(r.quantity) else float(r.quantity), float(r.amount), int(r.rows))
+            for r in df.itertuples(index=False)]
+
+
+def _month_bounds(month):
+    start = pd.Timestamp(month).to_period("M").start_time
+    return start.strftime("%Y-%m-%d"), (start + pd.offsets.MonthBegin(1)).strftime("%Y-%m-%d")
+
+
+def upsert(source: str, df: pd.DataFrame, label: Optional[str] = None, month=None) -> bool:
+    """Replace the stored days of *source* that *df* covers with *df*'s totals.
+
+    With *month*, only the rows of that calendar month are stored.
+    Returns ``True`` if the stored rows changed.
+    """
+    if not ENABLED or df is None or df.empty:
+        return False
+    start_time = time.time()
+    if month is not None:
+        in_month = (df["DATE"].dt.to_period("M") == pd.Timestamp(month).to_period("M")).to_numpy()
+        if not in_month.all():
+            print(f"Daily store {label or source}: ignoring {int((~in_month).sum())} row(s) outside "
+                  f"{pd.Timestamp(month):%Y-%m}", file=sys.stderr)
+            df = df[in_month]
+            if df.empty:
+                return False
+    new = sorted(_records(_daily_rows(df)))
+    days = sorted({r[0] for r in new})
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        old = []
+        for i in range(0, len(days), 500):
+            chunk = days[i:i + 500]
+            old += conn.execute(
+                f"SELECT day, store_key, store, quantity, amount, rows FROM daily_sales "
+                f"WHERE source = ? AND day IN ({','.join('?' * len(chunk))})", [source, *chunk]).fetchall()
+        changed = sorted(old) != new
+        if changed:
+            for i in range(0, len(days), 500):
+                chunk = days[i:i + 500]
+                conn.execute(f"DELETE FROM daily_sales WHERE source = ? AND day IN ({','.join('?' * len(chunk))})",
+                             [source, *chunk])
+            conn.executemany("INSERT INTO daily_sales (source, day, store_key, store, quantity, amount, rows) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", [(source, *r) for r in new])
+            conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
+    print(f"Daily store {label or source}: {len(days)} day(s), {len(new)} store-days "
+          f"{'updated' if changed else 'unchanged'} in {time.time() - start_time:.2f}s", file=sys.stderr)
+    return changed
+
+# ---------------------------------------------------------------------------
+# Read
+# ---------------------------------------------------------------------------
+
+def read_month(source: str, month) -> pd.DataFrame:
+    """Stored daily totals of *source* for the calendar month of *month*.
+
+    Returns ``Store``, ``DATE``, ``QUANTITY`` and ``AMOUNT`` columns, one row
+    per store and day, ready for ``report_metrics.aggregate_stores``.
+    """
+    rows = _connect().execute(
+        "SELECT store, day, quantity, amount FROM daily_sales "
+        "WHERE source = ? AND day >= ? AND day < ? ORDER BY day, store_key",
+        [source, *_month_bounds(month)]).fetchall()
+    df = pd.DataFrame(rows, columns=["Store", "DATE", "QUANTITY", "AMOUNT"])
+    df["DATE"] = pd.to_datetime(df["DATE"], format="%Y-%m-%d")
+    df["QUANTITY"] = df["QUANTITY"].astype(float).fillna(0)
+    df["AMOUNT"] = df["AMOUNT"].astype(float)
+    return df
+
+
+def read_previous_month(month) -> pd.DataFrame:
+    """Previous-month OSG totals for *month* when no previous-month file was uploaded.
+
+    The stored previous-month upload of that month if there is one, otherwise
+    the OSG days stored while that month was the report month.
+    """
+    stored = read_month("prev_osg", month)
+    return stored if not stored.empty else read_month("osg", month)
+
+# ---------------------------------------------------------------------------
+# Reset
+# ---------------------------------------------------------------------------
+
+def clear(month=None, day=None, source: Optional[str] = None) -> int:
+    """Remove the stored rows of one *month* or *day* (of every source, or
+    only *source*); returns the number of store-days removed.
+    """
+    if (month is None) == (day is None):
+        raise ValueError("Pass exactly one of month or day.")
+    if month is not None:
+        where, params = "day >= ? AND day < ?", list(_month_bounds(month))
+    else:
+        where, params = "day = ?", [pd.Timestamp(day).strftime("%Y-%m-%d")]
+    if source is not None:
+        where, params = where + " AND source = ?", params + [source]
+    conn = _connect()
+    with conn:
+        removed = conn.execute(f"DELETE FROM daily_sales WHERE {where}", params).rowcount
+        if removed:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
+    print(f"Daily store: removed {removed} store-day(s)", file=sys.stderr)
+    return removed
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reset days or months of the Report 1 daily store.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--clear-month", metavar="YYYY-MM", help="remove every stored day of this month")
+    target.add_argument("--clear-day", metavar="YYYY-MM-DD", help="remove this stored day")
+    parser.add_argument("--source", choices=["osg", "product", "prev_osg"], help="only this source (default: all)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    clear(month=args.clear_month, day=args.clear_day, source=args.source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# date_parsing.py
+"""Fast DATE column normalisation for uploaded sales workbooks.
+
+Upload DATE columns arrive in several shapes: native datetimes (Excel date
+cells), Excel serial numbers (date cells exported as General), and text such
+as ``"15-10-2026"``. A single ``pd.to_datetime(..., dayfirst=True)`` over an
+object column handles that mix element by element, slowly, and silently
+turns anything unexpected into NaT.
+
+``parse_dates`` splits the column by representation and parses each part on
+its fastest path:
+
+- ``native``    – datetime values, taken as they are.
+- ``serial``    – numbers, converted arithmetically from the 1899-12-30 epoch.
+- ``formatted`` – text in the column's dominant format, inferred once from
+  a sample and parsed with an explicit ``format=``.
+- ``fallback``  – the remaining text, parsed one value at a time.
+
+Values no path can read are reported as ``dropped``.
+"""
+
+import sys
+import warnings
+from collections import namedtuple
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+DateStats = namedtuple("DateStats", ["native", "serial", "formatted", "fallback", "dropped", "format"])
+
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+# Serials of 1900-01-01 .. 9999-12-31
+_SERIAL_MIN, _SERIAL_MAX = 1, 2958465
+_NUMBER_TYPES = (int, float, np.integer, np.floating)
+
+
+def _infer_format(text: pd.Series) -> Optional[str]:
+    """Most common day-first format among a sample of *text*."""
+    sample = text.head(1000).drop_duplicates().head(50)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        formats = [guess_datetime_format(v, dayfirst=True) for v in sample]
+    formats = pd.Series([f for f in formats if f])
+    return formats.mode().iloc[0] if len(formats) else None
+
+
+def _kind(t: type) -> Optional[str]:
+    if issubclass(t, (datetime, date)):
+        return "native"
+    if issubclass(t, _NUMBER_TYPES) and not issubclass(t, bool):
+        return "serial"
+    if issubclass(t, str):
+        return "text"
+    return None
+
+
+def parse_dates(values: pd.Series) -> Tuple[pd.Series, DateStats]:
+    """Parse *values* to ``datetime64``; unreadable values become NaT."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, DateStats(int(values.notna().sum()), 0, 0, 0, int(values.isna().sum()), None)
+
+    result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[us]")
+    present = values[values.notna()]
+    if pd.api.types.is_string_dtype(present.dtype) and not pd.api.types.is_object_dtype(present.dtype):
+        kinds = pd.Series("text", index=present.index)
+    elif pd.api.types.is_numeric_dtype(present.dtype) and not pd.api.types.is_bool_dtype(present.dtype):
+        kinds = pd.Series("serial", index=present.index)
+    else:
+        types = present.map(type)
+        kinds = types.map({t: _kind(t) for t in types.unique()})
+
+    native = present[kinds == "native"]
+    if len(native):
+        result[native.index] = pd.to_datetime(native)
+
+    serial = pd.to_numeric(present[kinds == "serial"])
+    serial = serial[(serial >= _SERIAL_MIN) & (serial <= _SERIAL_MAX)]
+    if len(serial):
+        result[serial.index] = EXCEL_EPOCH + pd.to_timedelta(serial.to_numpy(float), unit="D")
+
+    text = present[kinds == "text"].astype(str)
+    fmt = _infer_format(text) if len(text) else None
+    formatted = 0
+    if fmt:
+        parsed = pd.to_datetime(text, format=fmt, errors="coerce")
+        ok = parsed.notna()
+        result[parsed.index[ok]] = parsed[ok]
+        formatted = int(ok.sum())
+        text = text[~ok]
+    fallback = 0
+    if len(text):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(text, dayfirst=True, errors="coerce", format="mixed")
+        ok = parsed.notna()
+        result[parsed.index[ok]] = parsed[ok]
+        fallback = int(ok.sum())
+
+    stats = DateStats(len(native), len(serial), formatted, fallback, int(result.isna().sum()), fmt)
+    return result, stats
+
+
+def normalise_date_column(df: pd.DataFrame, label: str, column: str = "DATE") -> pd.DataFrame:
+    """Parse *df*'s *column* in place of the old value and drop unreadable rows.
+
+    Logs how many rows took each parsing path and how many were dropped.
+    """
+    parsed, stats = parse_dates(df[column])
+    df = df.assign(**{column: parsed})
+    print(f"{label} {column}: {stats.native} native, {stats.serial} serial, "
+          f"{stats.formatted} formatted ({stats.format}), {stats.fallback} fallback, "
+          f"{stats.dropped} dropped", file=sys.stderr)
+    return df.dropna(subset=[column]) if stats.dropped else df
@@ -0,0 +1,30 @@
+# gunicorn.conf.py
+"""Gunicorn settings, picked up automatically when started from the project root."""
+
+import os
+import sys
+
+import claim_processor
+import metrics
+
+# Threads per worker (gthread). Report progress streams (/progress/<id>/events)
+# stay open for a while; with threads they do not block other requests.
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+
+def on_starting(server):
+    """Build the OSID snapshot once in the master before any worker forks.
+
+    In shared mode every worker then attaches to the same memory-mapped
+    snapshot instead of parsing the workbook itself. Per-worker metric files
+    of a previous run are cleared so ``/metrics`` starts from zero.
+    """
+    metrics.clear_dir()
+    if not claim_processor.SHARED_DATASET:
+        return
+    try:
+        if claim_processor.prepare_snapshot():
+            print("OSID snapshot ready for workers.", file=sys.stderr)
+    except Exception as e:
+        # Workers fall back to building it on first lookup
+        print(f"Failed to prepare OSID snapshot: {e}", file=sys.stderr)
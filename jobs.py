@@ -0,0 +1,247 @@
+# jobs.py
+"""Background execution of the report routes.
+
+``/process_report1`` and ``/process_report2`` used to run inside the
+request, pinning a gunicorn worker (and the browser's connection) for up to
+the 300s timeout. A job runs the same route in a bounded process pool
+instead:
+
+1. ``submit`` stores the uploaded files and form fields under
+   ``JOB_DIR/<job id>/`` and queues the job; the request returns at once.
+2. A pool process replays the request against the route with Flask's test
+   client, so the report logic is exactly the synchronous one. The workbook
+   it returns is saved as the job's result.
+3. ``status`` / ``result_path`` read the job's files. Every gunicorn worker
+   can answer for any job, whichever worker queued it.
+
+Job state lives in ``status.json``, replaced atomically on each change:
+``queued`` → ``running`` → ``done`` | ``error``. Finished jobs, with their
+results, are removed ``JOB_TTL_MINUTES`` after they finish.
+
+Concurrency is bounded twice: ``JOB_WORKERS`` pool processes per gunicorn
+worker, and at most ``JOB_MAX_PENDING`` queued or running jobs on the box.
+Past that ``submit`` raises ``QueueFull`` and callers should retry later.
+
+Pool processes come from a ``forkserver`` that has imported ``app`` itself,
+never from the threaded gunicorn worker, so they cannot inherit locks or
+SQLite connections held by its request threads. If a pool process dies (e.g.
+OOM-killed), its jobs are marked as failed at once and the next ``submit``
+starts a new pool.
+"""
+
+import html
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from werkzeug.http import parse_options_header
+
+import progress
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+JOB_DIR = os.environ.get("JOB_DIR", os.path.join(tempfile.gettempdir(), "osg_jobs"))
+MAX_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "8"))
+JOB_TTL = float(os.environ.get("JOB_TTL_MINUTES", "60")) * 60
+# Queued or running jobs older than this are presumed lost (e.g. the worker
+# that owned the pool was restarted) and marked as failed.
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT_MINUTES", "30")) * 60
+
+# Report name -> route the job replays
+ROUTES = {"report1": "/process_report1", "report2": "/process_report2"}
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ACTIVE = ("queued", "running")
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+_EXECUTOR_PID = None
+_LOCK = threading.Lock()
+
+
+class QueueFull(RuntimeError):
+    """Too many jobs are queued or running."""
+
+# ---------------------------------------------------------------------------
+# Job files
+# ---------------------------------------------------------------------------
+
+def _job_dir(job_id: str) -> str:
+    if not _JOB_ID.match(job_id or ""):
+        raise KeyError(job_id)
+    return os.path.join(JOB_DIR, job_id)
+
+
+def _write_status(job_id: str, **fields) -> Dict[str, object]:
+    """Merge *fields* into the job's status file (atomic replace)."""
+    path = os.path.join(_job_dir(job_id), "status.json")
+    current = _read_json(path) or {"job_id": job_id}
+    current.update(fields)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(current, fh)
+    os.replace(tmp, path)
+    return current
+
+
+def _read_json(path: str) -> Optional[Dict[str, object]]:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def status(job_id: str) -> Optional[Dict[str, object]]:
+    """The job's status record, or ``None`` if there is no such job."""
+    try:
+        record = _read_json(os.path.join(_job_dir(job_id), "status.json"))
+    except KeyError:
+        return None
+    if record and record["status"] in ACTIVE:
+        record["elapsed"] = round(time.time() - record["submitted"], 1)
+    return record
+
+
+def result_path(job_id: str) -> Optional[str]:
+    """Path of a finished job's workbook, or ``None``."""
+    record = status(job_id)
+    if not record or record["status"] != "done":
+        return None
+    return os.path.join(_job_dir(job_id), "result.xlsx")
+
+
+def _records():
+    try:
+        names = os.listdir(JOB_DIR)
+    except OSError:
+        return []
+    return [r for r in (status(name) for name in names if _JOB_ID.match(name)) if r]
+
+
+def active_count() -> int:
+    """Jobs queued or running on this machine (all gunicorn workers)."""
+    return sum(1 for r in _records() if r["status"] in ACTIVE)
+
+
+def sweep() -> int:
+    """Remove expired finished jobs and fail lost ones; returns jobs removed."""
+    now = time.time()
+    removed = 0
+    for record in _records():
+        job_id = record["job_id"]
+        if record["status"] in ACTIVE:
+            if now - record["submitted"] > JOB_TIMEOUT:
+                _write_status(job_id, status="error", finished=now, error="Job was lost or timed out.")
+        elif now - record.get("finished", now) > JOB_TTL:
+            shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+            removed += 1
+    return removed
+
+# ---------------------------------------------------------------------------
+# Submission & execution
+# ---------------------------------------------------------------------------
+
+def _executor(broken: Optional[ProcessPoolExecutor] = None) -> ProcessPoolExecutor:
+    """This process's pool, created on first use, after a fork, or to replace *broken*."""
+    global _EXECUTOR, _EXECUTOR_PID
+    with _LOCK:
+        if _EXECUTOR is not None and _EXECUTOR is broken:
+            print("Job pool is broken; starting a new one.", file=sys.stderr)
+            _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+            _EXECUTOR = None
+        if _EXECUTOR is None or _EXECUTOR_PID != os.getpid():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["app"])
+            _EXECUTOR = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=context)
+            _EXECUTOR_PID = os.getpid()
+        return _EXECUTOR
+
+
+def _finished(job_id: str, future: Future) -> None:
+    """Fail the job if its pool process died before ``_run`` could record an outcome."""
+    if future.cancelled():
+        error = "Job was cancelled."
+    elif future.exception() is not None:
+        error = f"Job process failed: {type(future.exception()).__name__}: {future.exception()}"
+    else:
+        return
+    record = status(job_id)
+    if record and record["status"] in ACTIVE:
+        _write_status(job_id, status="error", finished=time.time(), error=error)
+        print(f"Job {job_id} failed: {error}", file=sys.stderr)
+
+
+def submit(report: str, form: Dict[str, str], files: Dict[str, Tuple[str, bytes]]) -> str:
+    """Queue *report* with the request's *form* fields and *files*
+    ({field: (filename, bytes)}); returns the job id.
+    """
+    if report not in ROUTES:
+        raise KeyError(report)
+    sweep()
+    if active_count() >= MAX_PENDING:
+        raise QueueFull(f"{MAX_PENDING} reports are already being generated; please try again shortly.")
+
+    job_id = uuid.uuid4().hex
+    inputs = os.path.join(_job_dir(job_id), "inputs")
+    os.makedirs(inputs)
+    for field, (filename, data) in files.items():
+        with open(os.path.join(inputs, field), "wb") as fh:
+            fh.write(data)
+    _write_status(job_id, report=report, status="queued", submitted=time.time(),
+                  form=form, files={field: filename for field, (filename, _) in files.items()})
+    executor = _executor()
+    try:
+        future = executor.submit(_run, job_id)
+    except BrokenProcessPool:
+        future = _executor(broken=executor).submit(_run, job_id)
+    future.add_done_callback(lambda f: _finished(job_id, f))
+    print(f"Queued {report} job {job_id}", file=sys.stderr)
+    return job_id
+
+
+def _run(job_id: str) -> None:
+    """Pool entry point: replay the job's request and store the outcome."""
+    record = _write_status(job_id, status="running", started=time.time())
+    inputs = os.path.join(_job_dir(job_id), "inputs")
+    try:
+        from app import app  # preloaded by the forkserver
+
+        data = dict(record["form"])
+        for field, filename in record["files"].items():
+            with open(os.path.join(inputs, field), "rb") as fh:
+                data[field] = (BytesIO(fh.read()), filename)
+        # The route publishes its stage progress under the job id
+        response = app.test_client().post(ROUTES[record["report"]], data=data, content_type="multipart/form-data",
+                                          headers={progress.HEADER: job_id})
+
+        if response.status_code == 200 and response.mimetype == XLSX_MIMETYPE:
+            with open(os.path.join(_job_dir(job_id), "result.xlsx"), "wb") as fh:
+                fh.write(response.get_data())
+            _, options = parse_options_header(response.headers.get("Content-Disposition", ""))
+            _write_status(job_id, status="done", finished=time.time(),
+                          download_name=options.get("filename", f"{record['report']}.xlsx"))
+        else:
+            # Routes answer with plain-text or HTML error pages; keep the text
+            text = re.sub(r"<(style|script)[^>]*>.*?</\1>|<[^>]+>", "", response.get_data(as_text=True), flags=re.S)
+            message = re.sub(r"\n\s*\n+", "\n", html.unescape(text))
+            _write_status(job_id, status="error", finished=time.time(), http_status=response.status_code,
+                          error=message.strip()[:20000])
+    except Exception as e:
+        _write_status(job_id, status="error", finished=time.time(), error=f"{type(e).__name__}: {e}")
+    finally:
+        shutil.rmtree(inputs, ignore_errors=True)
+    print(f"Finished job {job_id} in {time.time() - record['started']:.2f}s", file=sys.stderr)
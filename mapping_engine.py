@@ -0,0 +1,493 @@
+# mapping_engine.py
+"""Batch OSG ↔ product mapping used by ``/process_mapping``.
+
+An OSG file lists warranty plans sold (customer mobile, plan SKU, plan
+price). A product file lists the products sold (customer mobile, category,
+model, IMEI, sold price). The engine finds, for every plan, the product it
+covers:
+
+1. Parse every plan SKU once, column-wise: warranty category, price slab
+   (``Slab : 10K-20K``) and duration (``Dur : 1+2``).
+2. Resolve each product category to the warranty categories it is
+   eligible for with ``KeywordMatcher`` (longest keyword wins).
+3. Join plans to products on customer mobile and that table in bulk, keep
+   products whose sold price falls inside the plan's slab, and give each
+   plan the closest-dated product not already taken by another plan.
+
+All steps are whole-column pandas operations; nothing iterates per row, so
+product files with hundreds of thousands of rows map in seconds.
+"""
+
+import re
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from column_schema import MAPPING_OSG, MAPPING_PRODUCT
+from date_parsing import parse_dates
+from mobile_numbers import mobile_keys
+
+# ---------------------------------------------------------------------------
+# Warranty SKU category → eligible product categories
+# ---------------------------------------------------------------------------
+
+sku_category_mapping = {
+    "Warranty : Water Cooler/Dispencer/Geyser/RoomCooler/Heater": [
+        "COOLER", "DISPENCER", "GEYSER", "ROOM COOLER", "HEATER", "WATER HEATER", "WATER DISPENSER"
+    ],
+    "Warranty : Fan/Mixr/IrnBox/Kettle/OTG/Grmr/Geysr/Steamr/Inductn": [
+        "FAN", "MIXER", "IRON BOX", "KETTLE", "OTG", "GROOMING KIT", "GEYSER", "STEAMER", "INDUCTION",
+        "CEILING FAN", "TOWER FAN", "PEDESTAL FAN", "INDUCTION COOKER", "ELECTRIC KETTLE", "WALL FAN", "MIXER GRINDER", "CELLING FAN"
+    ],
+    "AC : EWP : Warranty : AC": ["AC", "AIR CONDITIONER", "AC INDOOR"],
+    "HAEW : Warranty : Air Purifier/WaterPurifier": ["AIR PURIFIER", "WATER PURIFIER"],
+    "HAEW : Warranty : Dryer/MW/DishW": ["DRYER", "MICROWAVE OVEN", "DISH WASHER", "MICROWAVE OVEN-CONV"],
+    "HAEW : Warranty : Ref/WM": [
+        "REFRIGERATOR", "WASHING MACHINE", "WASHING MACHINE-TL", "REFRIGERATOR-DC",
+        "WASHING MACHINE-FL", "WASHING MACHINE-SA", "REF", "REFRIGERATOR-CBU", "REFRIGERATOR-FF", "WM"
+    ],
+    "HAEW : Warranty : TV": ["TV", "TV 28 %", "TV 18 %"],
+    "TV : TTC : Warranty and Protection : TV": ["TV", "TV 28 %", "TV 18 %"],
+    "TV : Spill and Drop Protection": ["TV", "TV 28 %", "TV 18 %"],
+    "HAEW : Warranty :Chop/Blend/Toast/Air Fryer/Food Processr/JMG/Induction": [
+        "CHOPPER", "BLENDER", "TOASTER", "AIR FRYER", "FOOD PROCESSOR", "JUICER", "INDUCTION COOKER"
+    ],
+    "HAEW : Warranty : HOB and Chimney": ["HOB", "CHIMNEY"],
+    "HAEW : Warranty : HT/SoundBar/AudioSystems/PortableSpkr": [
+        "HOME THEATRE", "AUDIO SYSTEM", "SPEAKER", "SOUND BAR", "PARTY SPEAKER"
+    ],
+    "HAEW : Warranty : Vacuum Cleaner/Fans/Groom&HairCare/Massager/Iron": [
+        "VACUUM CLEANER", "FAN", "MASSAGER", "IRON BOX", "CEILING FAN", "TOWER FAN", "PEDESTAL FAN", "WALL FAN", "ROBO VACCUM CLEANER"
+    ],
+    "AC AMC": ["AC", "AC INDOOR"]
+}
+
+# ---------------------------------------------------------------------------
+# Output columns
+# ---------------------------------------------------------------------------
+
+# Product fields copied onto each mapped plan, with their output names
+MAPPED_FIELDS = {
+    "Model": "Model",
+    "Brand": "Brand",
+    "IMEI": "IMEI",
+    "Category": "Product Category",
+    "Sold Price": "Product Price",
+    "Invoice Number": "Product Invoice",
+}
+
+# ---------------------------------------------------------------------------
+# Batch SKU parsing
+# ---------------------------------------------------------------------------
+
+def extract_sku_categories(sku: pd.Series) -> pd.Series:
+    """Warranty category named in each SKU (longest category name wins)."""
+    matcher = get_keyword_matcher()
+    found = sku.astype(str).str.extract(matcher.sku_pattern, flags=re.IGNORECASE)[0]
+    return found.str.lower().map(matcher.category_by_lower)
+
+
+def extract_price_slabs(sku: pd.Series) -> pd.DataFrame:
+    """``Slab : 10K-20K`` in each SKU as ``Slab Low`` / ``Slab High`` in rupees (NaN without a slab)."""
+    bounds = sku.astype(str).str.extract(r"Slab\s*:\s*(\d+)K-(\d+)K")
+    return pd.DataFrame({
+        "Slab Low": pd.to_numeric(bounds[0]) * 1000,
+        "Slab High": pd.to_numeric(bounds[1]) * 1000,
+    }, index=sku.index)
+
+
+def extract_warranty_durations(sku: pd.Series) -> pd.DataFrame:
+    """Manufacturer / extended warranty years named in each SKU.
+
+    Patterns, in priority order: ``Dur : 1+2``, ``1+2 SDP-1`` (extended
+    becomes ``"1P+2W"``), ``Dur : 2`` (1 year manufacturer) and a bare
+    ``1+2``. Each pattern is only tried on the SKUs no earlier pattern
+    matched; SKUs none matches get empty strings.
+    """
+    text = sku.astype(str)
+    first = pd.Series("", index=sku.index, dtype=object)
+    second = pd.Series("", index=sku.index, dtype=object)
+    pending = text
+
+    def take(pattern):
+        nonlocal pending
+        found = pending.str.extract(pattern).dropna(subset=[0])
+        pending = pending.drop(found.index)
+        return found
+
+    found = take(r"Dur\s*:\s*(\d+)\+(\d+)")
+    first[found.index] = found[0].astype(int)
+    second[found.index] = found[1].astype(int)
+
+    found = take(r"(\d+)\+(\d+)\s*SDP-(\d+)")
+    first[found.index] = found[0].astype(int)
+    second[found.index] = found[2] + "P+" + found[1] + "W"
+
+    found = take(r"Dur\s*:\s*(\d+)")
+    first[found.index] = 1
+    second[found.index] = found[0].astype(int)
+
+    found = take(r"(\d+)\+(\d+)")
+    first[found.index] = found[0].astype(int)
+    second[found.index] = found[1].astype(int)
+
+    return pd.DataFrame({"Manufacturer Warranty": first, "Extended Warranty": second})
+
+
+# ---------------------------------------------------------------------------
+# Product category → warranty category matcher
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"[A-Z0-9]+|%")
+
+
+def _tokens(text) -> Tuple[str, ...]:
+    return tuple(_TOKEN_RE.findall(str(text).upper()))
+
+
+class KeywordMatcher:
+    """``sku_category_mapping`` compiled into an exact-token phrase index.
+
+    Keywords and product categories are split into upper-case word tokens
+    (``"Washing Machine-TL"`` → ``WASHING MACHINE TL``). A product category
+    matches the longest keyword phrase found anywhere in its tokens, so
+    ``"TOWER FAN 48IN"`` resolves to ``TOWER FAN`` rather than ``FAN``; ties go
+    to the leftmost phrase. The matched keyword then expands to every
+    warranty category that lists it (``TV`` is eligible for three).
+
+    Each phrase lookup is one hash probe, and a column is matched once per
+    distinct value, so cost does not grow with the number of keywords.
+    """
+
+    def __init__(self, mapping: Dict[str, List[str]]):
+        self.phrases: Dict[Tuple[str, ...], str] = {}
+        self.categories: Dict[str, Tuple[str, ...]] = {}
+        for category, keywords in mapping.items():
+            for keyword in keywords:
+                key = _tokens(keyword)
+                if not key:
+                    continue
+                name = self.phrases.setdefault(key, " ".join(key))
+                if category not in self.categories.get(name, ()):
+                    self.categories[name] = self.categories.get(name, ()) + (category,)
+        self.max_len = max((len(k) for k in self.phrases), default=0)
+        self.table = pd.DataFrame(
+            [(kw, cat) for kw, cats in self.categories.items() for cat in cats],
+            columns=["Matched Keyword", "SKU Category"],
+        )
+        # SKU text → warranty category, for extract_sku_categories
+        self.sku_pattern = "(" + "|".join(
+            re.escape(k) for k in sorted(mapping, key=len, reverse=True)
+        ) + ")"
+        self.category_by_lower = {k.lower(): k for k in mapping}
+
+    def match(self, text) -> Optional[str]:
+        """Longest keyword phrase in *text*, or ``None``."""
+        tokens = _tokens(text)
+        for size in range(min(self.max_len, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                keyword = self.phrases.get(tokens[start:start + size])
+                if keyword is not None:
+                    return keyword
+        return None
+
+    def match_keywords(self, values: pd.Series) -> pd.Series:
+        """Column-wise ``match``; each distinct value is matched once."""
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        matched = np.array([self.match(u) for u in uniques] + [None], dtype=object)
+        return pd.Series(matched[codes], index=values.index, name="Matched Keyword")
+
+    def eligible_categories(self, values: pd.Series) -> pd.Series:
+        """Tuple of eligible warranty categories per value (empty when none match)."""
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        eligible = np.empty(len(uniques) + 1, dtype=object)
+        eligible[:] = [self.categories.get(self.match(u), ()) for u in uniques] + [()]
+        return pd.Series(eligible[codes], index=values.index, name="Eligible Categories")
+
+
+def _mapping_key(mapping: Dict[str, List[str]]) -> Tuple:
+    return tuple((cat, tuple(keywords)) for cat, keywords in mapping.items())
+
+
+_MATCHER = KeywordMatcher(sku_category_mapping)
+_MATCHER_KEY = _mapping_key(sku_category_mapping)
+
+
+def get_keyword_matcher(mapping: Optional[Dict[str, List[str]]] = None) -> KeywordMatcher:
+    """Compiled matcher for *mapping* (default ``sku_category_mapping``).
+
+    The default matcher is built at import and only rebuilt when the mapping
+    has been edited since.
+    """
+    global _MATCHER, _MATCHER_KEY
+    mapping = sku_category_mapping if mapping is None else mapping
+    key = _mapping_key(mapping)
+    if key == _MATCHER_KEY:
+        return _MATCHER
+    matcher = KeywordMatcher(mapping)
+    if mapping is sku_category_mapping:
+        _MATCHER, _MATCHER_KEY = matcher, key
+    return matcher
+
+# ---------------------------------------------------------------------------
+# Price slab index
+# ---------------------------------------------------------------------------
+
+class SlabIndex:
+    """Distinct price slabs offered per warranty category.
+
+    Built from the parsed plan SKUs. ``cover`` answers "which slabs of its
+    eligible categories contain this product's sold price" for a whole
+    product column in one pass per category. Slab bounds are inclusive, so a
+    price sitting on a shared bound (20000 for ``10K-20K`` and ``20K-30K``)
+    falls in both slabs.
+    """
+
+    def __init__(self, details: pd.DataFrame):
+        slabs = details[["SKU Category", "Slab Low", "Slab High"]].dropna().drop_duplicates()
+        self.bounds: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for category, group in slabs.groupby("SKU Category", sort=False):
+            group = group.sort_values(["Slab Low", "Slab High"])
+            self.bounds[category] = (group["Slab Low"].to_numpy(float), group["Slab High"].to_numpy(float))
+
+    def cover(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Slabs containing each row's ``_price`` within its ``SKU Category``.
+
+        Returns one row per (input row, slab) with the input index in
+        ``_row`` and the slab in ``Slab Low`` / ``Slab High``. Rows whose
+        category has no slabs, or whose price is missing, are left out.
+        """
+        parts = []
+        category = rows["SKU Category"].to_numpy()
+        price = rows["_price"].to_numpy(float)
+        for name, (low, high) in self.bounds.items():
+            pos = np.flatnonzero(category == name)
+            if not len(pos):
+                continue
+            p = price[pos, None]
+            row, slab = np.nonzero((p >= low) & (p <= high))
+            parts.append(pd.DataFrame({
+                "_row": rows.index.to_numpy()[pos[row]],
+                "SKU Category": name,
+                "Slab Low": low[slab],
+                "Slab High": high[slab],
+            }))
+        if not parts:
+            return pd.DataFrame({"_row": pd.Series(dtype=rows.index.dtype), "SKU Category": pd.Series(dtype=object),
+                                 "Slab Low": pd.Series(dtype=float), "Slab High": pd.Series(dtype=float)})
+        return pd.concat(parts, ignore_index=True)
+
+    def has_slabs(self, category: pd.Series) -> pd.Series:
+        """Whether any plan SKU in each row's category is slab-priced."""
+        return category.isin(list(self.bounds))
+
+# ---------------------------------------------------------------------------
+# Bulk join
+# ---------------------------------------------------------------------------
+
+def _assign_products(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Pick one product per plan, never giving a product to two plans.
+
+    *pairs* holds every eligible (``_osg_row``, ``_prod_row``) combination of
+    a customer ``_mobile`` with a ``_rank`` (lower is better). One greedy pass
+    over the pairs, best rank first (ties to the earliest plan, then product),
+    takes every pair whose plan and product are both still free.
+
+    Pairs only join plans and products of the same mobile, so mobiles are
+    assigned independently. Where every plan of a mobile ranks a different
+    product best, that is the answer; only the remaining mobiles (a shared
+    placeholder number, many undated rows) go through the pass.
+    """
+    pairs = pairs.sort_values(["_rank", "_osg_row", "_prod_row"], kind="stable")
+    best = pairs.drop_duplicates("_osg_row")
+    contested = best.loc[best.duplicated(["_mobile", "_prod_row"], keep=False), "_mobile"].unique()
+    chosen = [best.loc[~best["_mobile"].isin(contested), ["_osg_row", "_prod_row"]]]
+
+    rest = pairs[pairs["_mobile"].isin(contested)]
+    if not rest.empty:
+        plans, products = rest["_osg_row"].to_numpy(), rest["_prod_row"].to_numpy()
+        plan_used = np.zeros(plans.max() + 1, dtype=bool)
+        product_used = np.zeros(products.max() + 1, dtype=bool)
+        taken = []
+        for i, (plan, product) in enumerate(zip(plans.tolist(), products.tolist())):
+            if not plan_used[plan] and not product_used[product]:
+                plan_used[plan] = product_used[product] = True
+                taken.append(i)
+        chosen.append(rest.iloc[taken][["_osg_row", "_prod_row"]])
+    return pd.concat(chosen, ignore_index=True).astype(np.int64)
+
+
+MappingResult = namedtuple("MappingResult", ["mapped", "outside_slabs", "flagged", "validation"])
+
+
+def run_mapping(osg_df: pd.DataFrame, product_df: pd.DataFrame) -> MappingResult:
+    """Map every OSG plan to a product.
+
+    ``mapped`` is *osg_df* with SKU details and the matched product's fields
+    added; plans without an eligible product keep empty product fields.
+    ``outside_slabs`` lists the product rows whose category is sold with
+    slab-priced plans but whose price lies outside every such slab.
+    ``flagged`` and ``validation`` are the row mask and per-rule counts from
+    ``validate_rows``.
+    """
+    osg = MAPPING_OSG.apply(osg_df).reset_index(drop=True)
+    products = MAPPING_PRODUCT.apply(product_df).reset_index(drop=True)
+
+    sku = osg["Retailer SKU"]
+    details = pd.concat([
+        extract_sku_categories(sku).rename("SKU Category"),
+        extract_price_slabs(sku),
+        extract_warranty_durations(sku),
+    ], axis=1)
+    slab_index = SlabIndex(details)
+
+    plans = pd.DataFrame({
+        "_osg_row": np.arange(len(osg)),
+        "_mobile": mobile_keys(osg["Customer Mobile"]),
+        "SKU Category": details["SKU Category"],
+        "Slab Low": details["Slab Low"],
+        "Slab High": details["Slab High"],
+        "_date": parse_dates(osg["DATE"])[0] if "DATE" in osg.columns else pd.NaT,
+    })
+    plans = plans[(plans["_mobile"] >= 0) & plans["SKU Category"].notna()]
+
+    matcher = get_keyword_matcher()
+    keywords = matcher.match_keywords(products["Category"])
+    sold = pd.DataFrame({
+        "_prod_row": np.arange(len(products)),
+        "_mobile": mobile_keys(products["Customer Mobile"]),
+        "Matched Keyword": keywords,
+        "_price": pd.to_numeric(products["Sold Price"], errors="coerce") if "Sold Price" in products.columns else np.nan,
+        "_prod_date": parse_dates(products["DATE"])[0] if "DATE" in products.columns else pd.NaT,
+    })
+    # One row per (product, eligible warranty category)
+    sold = sold.merge(matcher.table, on="Matched Keyword")
+    covered = slab_index.cover(sold)
+
+    slabbed = np.zeros(len(products), dtype=bool)
+    slabbed[sold["_prod_row"].to_numpy()[slab_index.has_slabs(sold["SKU Category"]).to_numpy()]] = True
+    slabbed[sold["_prod_row"].to_numpy()[covered["_row"].to_numpy()]] = False
+    outside = np.flatnonzero(slabbed)
+    outside_slabs = products.iloc[outside].assign(**{"Matched Keyword": keywords.iloc[outside].to_numpy()})
+
+    # Slab-priced plans join the products covered by their exact slab;
+    # plans without a slab take any product of their category.
+    covered = covered.join(sold[["_prod_row", "_mobile", "_prod_date"]], on="_row")
+    keyed = sold[sold["_mobile"] >= 0]
+    covered = covered[covered["_mobile"] >= 0]
+    open_plans = plans["Slab Low"].isna()
+    pairs = pd.concat([
+        plans[~open_plans].merge(covered, on=["_mobile", "SKU Category", "Slab Low", "Slab High"]),
+        plans[open_plans].merge(keyed, on=["_mobile", "SKU Category"]),
+    ], ignore_index=True)
+    # Prefer the product sold closest to the plan; undated pairs rank last
+    pairs = pairs.assign(_rank=(pairs["_date"] - pairs["_prod_date"]).abs().fillna(pd.Timedelta.max))
+    assigned = _assign_products(pairs[["_osg_row", "_prod_row", "_mobile", "_rank"]])
+
+    mapped = pd.DataFrame(index=osg.index)
+    prod_row = pd.Series(assigned["_prod_row"].to_numpy(), index=assigned["_osg_row"].to_numpy())
+    prod_row = prod_row.reindex(osg.index)
+    hit = prod_row.notna().to_numpy()
+    for source, target in MAPPED_FIELDS.items():
+        if source not in products.columns:
+            mapped[target] = np.nan
+            continue
+        values = pd.Series(np.nan, index=osg.index, dtype=object)
+        values[hit] = products[source].to_numpy()[prod_row[hit].astype(int).to_numpy()]
+        mapped[target] = values
+
+    result = pd.concat([osg, details, mapped], axis=1)
+    flagged, validation = validate_rows(result)
+    return MappingResult(result, outside_slabs, flagged, validation)
+
+
+def map_osg_to_products(osg_df: pd.DataFrame, product_df: pd.DataFrame) -> pd.DataFrame:
+    """Mapped OSG rows only; see ``run_mapping``."""
+    return run_mapping(osg_df, product_df).mapped
+
+# ---------------------------------------------------------------------------
+# Data-quality checks & export
+# ---------------------------------------------------------------------------
+
+HIGHLIGHT_COLOR = "#ADD8E6"  # lightblue
+FLAG_COLUMN = "Flagged"  # hidden last column of "Mapped Data" that drives the highlight
+
+
+def _blank(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(True, index=df.index)
+    values = df[column]
+    return values.isna() | (values.astype(str).str.strip() == "")
+
+
+def _invalid_price(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    values = df[column]
+    price = pd.to_numeric(values, errors="coerce")
+    invalid = price < 0
+    unparsed = price.isna() & values.notna()
+    if unparsed.any():
+        # Text pandas cannot parse may still be a float() literal ("nan",
+        # "1_000"); judge each distinct value once with float() itself.
+        verdicts = {v: _invalid_literal(v) for v in values[unparsed].drop_duplicates()}
+        invalid[unparsed] = values[unparsed].map(verdicts).astype(bool)
+    return invalid
+
+
+def _invalid_literal(value) -> bool:
+    try:
+        return float(value) < 0
+    except (TypeError, ValueError):
+        return True
+
+
+# Rule name -> check returning a boolean Series (True = row fails the rule)
+VALIDATION_RULES = {
+    "Missing Model": lambda df: _blank(df, "Model"),
+    "Missing IMEI": lambda df: _blank(df, "IMEI"),
+    "Invalid Plan Price": lambda df: _invalid_price(df, "Plan Price"),
+}
+
+
+def validate_rows(df: pd.DataFrame) -> Tuple[pd.Series, pd.DataFrame]:
+    """Check every row against ``VALIDATION_RULES``.
+
+    Returns the per-row flag mask (any rule failed) and a summary table with
+    the number of rows failing each rule, plus the flagged-row total.
+    """
+    failures = pd.DataFrame({rule: check(df) for rule, check in VALIDATION_RULES.items()}, index=df.index)
+    flagged = failures.any(axis=1)
+    summary = pd.DataFrame({
+        "Rule": list(failures.columns) + ["Rows Flagged"],
+        "Rows": [int(n) for n in failures.sum()] + [int(flagged.sum())],
+    })
+    return flagged, summary
+
+
+def write_mapping_workbook(result: "MappingResult", output) -> None:
+    """Write a mapping result to *output* as an xlsx workbook.
+
+    Flagged rows are shaded by one conditional format over the whole data
+    range that reads a hidden ``Flagged`` column, so the sheet XML stays the
+    same size however the flagged rows are spread.
+    """
+    from xlsxwriter.utility import xl_col_to_name
+
+    mapped = result.mapped
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        flag_col = len(mapped.columns)
+        mapped.assign(**{FLAG_COLUMN: result.flagged.to_numpy(bool)}).to_excel(
+            writer, index=False, sheet_name="Mapped Data")
+        sheet = writer.sheets["Mapped Data"]
+        sheet.set_column(flag_col, flag_col, None, None, {"hidden": True})
+        if result.flagged.any() and flag_col:
+            highlight = writer.book.add_format({"bg_color": HIGHLIGHT_COLOR})
+            sheet.conditional_format(1, 0, len(mapped), flag_col - 1, {
+                "type": "formula", "criteria": f"=${xl_col_to_name(flag_col)}2", "format": highlight,
+            })
+        result.validation.to_excel(writer, index=False, sheet_name="Validation Summary")
+        if not result.outside_slabs.empty:
+            result.outside_slabs.to_excel(writer, index=False, sheet_name="Outside Price Slabs")
@@ -0,0 +1,107 @@
+# master_data.py
+"""Process-wide registry for the master workbooks shipped with the app.
+
+The report routes join every upload against the same three master files:
+
+- ``myG All Store.xlsx``     – full store list (Report 1).
+- ``RBM,BDM,BRANCH.xlsx``    – store → RBM assignment (Report 1).
+- ``Future Store List.xlsx`` – store list for the Day View (Report 2).
+
+These files change rarely, so each one is parsed and normalised once per
+worker and kept in memory. An entry is reloaded when the file's mtime moves,
+mirroring ``claim_processor.load_excel_data``.
+
+Frames returned from here are shared between requests and must be treated
+as read-only.
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+STORE_LIST_FILE = "myG All Store.xlsx"
+RBM_FILE = "RBM,BDM,BRANCH.xlsx"
+FUTURE_STORE_FILE = "Future Store List.xlsx"
+MASTER_FILES = (STORE_LIST_FILE, RBM_FILE, FUTURE_STORE_FILE)
+
+STORE_ALIASES = ["store", "branch"]
+RBM_ALIASES = ["rbm", "manager"]
+
+# ---------------------------------------------------------------------------
+# Normalisers – applied once per load
+# ---------------------------------------------------------------------------
+
+def _rename_first(df: pd.DataFrame, aliases: list, target: str) -> pd.DataFrame:
+    """Rename the first column whose lower-cased name is in *aliases*."""
+    for col in df.columns:
+        if str(col).strip().lower() in aliases:
+            if col != target:
+                df = df.rename(columns={col: target})
+            break
+    return df
+
+
+def _normalise_store_list(df: pd.DataFrame) -> pd.DataFrame:
+    df = _rename_first(df, STORE_ALIASES, "Store")
+    return df[["Store"]].reset_index(drop=True)
+
+
+def _normalise_rbm(df: pd.DataFrame) -> pd.DataFrame:
+    df = _rename_first(df, STORE_ALIASES, "Store")
+    df = _rename_first(df, RBM_ALIASES, "RBM")
+    return df[["Store", "RBM"]].reset_index(drop=True)
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+# path -> (mtime, normalised frame)
+_CACHE: Dict[str, Tuple[float, pd.DataFrame]] = {}
+_LOCK = threading.Lock()
+
+
+def _load(path: str, normaliser: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+    """Return the normalised frame for *path*, re-reading it only when it changed."""
+    file_mtime = os.path.getmtime(path)
+    entry = _CACHE.get(path)
+    if entry is not None and file_mtime <= entry[0]:
+        return entry[1]
+
+    with _LOCK:
+        entry = _CACHE.get(path)
+        if entry is not None and file_mtime <= entry[0]:
+            return entry[1]
+
+        start_time = time.time()
+        df = normaliser(pd.read_excel(path, engine="openpyxl"))
+        _CACHE[path] = (file_mtime, df)
+        print(f"Loaded master file {path} ({len(df)} rows) in {time.time() - start_time:.2f}s", file=sys.stderr)
+        return df
+
+
+def get_store_list(path: str = STORE_LIST_FILE) -> pd.DataFrame:
+    """Store list for Report 1 as a single ``Store`` column."""
+    return _load(path, _normalise_store_list)
+
+
+def get_rbm_map(path: str = RBM_FILE) -> pd.DataFrame:
+    """Store → RBM assignment as ``Store`` / ``RBM`` columns, ready to merge."""
+    return _load(path, _normalise_rbm)
+
+
+def get_future_stores(path: str = FUTURE_STORE_FILE) -> pd.DataFrame:
+    """Store list for the Day View report as a single ``Store`` column."""
+    return _load(path, _normalise_store_list)
+
+
+def clear_cache() -> None:
+    """Drop every cached master frame (next access re-reads from disk)."""
+    with _LOCK:
+        _CACHE.clear()
@@ -0,0 +1,292 @@
+# metrics.py
+"""Prometheus-style metrics shared by all gunicorn workers.
+
+Each process counts in memory: a lock, a dict update and, for histograms, a
+bucket lookup per observation. A daemon thread writes the process's totals
+to ``METRICS_DIR/<pid>.json`` every ``METRICS_FLUSH_SECONDS``. ``/metrics``
+merges every file into one Prometheus text exposition:
+
+- counters and histograms are summed over all files. Files of exited
+  processes (replaced workers, job pool processes) are kept, so totals
+  never go backwards while the server runs;
+- gauges are summed over live processes only.
+
+Each process also flushes once more on exit, so a recycled or stopped
+worker keeps its last observations. The gunicorn master clears
+``METRICS_DIR`` on start (``gunicorn.conf.py``). A forked process starts its
+own registry instead of recounting its parent's observations.
+
+Metric names and types are declared in ``METRICS``. Set ``METRICS=0`` to
+disable recording.
+"""
+
+import atexit
+import json
+import math
+import multiprocessing.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "osg_metrics"))
+FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+ENABLED = os.environ.get("METRICS", "1") == "1"
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help)
+METRICS = {
+    "osg_request_seconds": ("histogram", "Request latency by Flask endpoint."),
+    "osg_requests_total": ("counter", "Requests by Flask endpoint and status code."),
+    "osg_stage_seconds": ("histogram", "Duration of report / mapping pipeline stages."),
+    "osg_cache_lookups_total": ("counter", "In-process cache lookups by cache and result (hit / miss)."),
+    "osg_osid_load_seconds": ("histogram", "Time to load and index the OSID workbook."),
+    "osg_external_call_seconds": ("histogram", "Latency of SMTP and Apps Script calls."),
+    "osg_external_call_errors_total": ("counter", "Failed SMTP and Apps Script calls."),
+    "osg_claim_backlog": ("gauge", "Warranty claims still being processed in background threads."),
+    "osg_jobs_active": ("gauge", "Report jobs queued or running on this machine."),
+}
+
+_LOCK = threading.Lock()
+_PID = None
+_COUNTERS: Dict[tuple, float] = {}
+_GAUGES: Dict[tuple, float] = {}
+_HISTOGRAMS: Dict[tuple, list] = {}  # key -> [count per bucket (+Inf last), sum]
+_DIRTY = False
+
+# name -> callable returning the current value, evaluated at scrape time
+_COLLECTORS: Dict[str, Callable[[], float]] = {}
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def _key(name: str, labels: Dict[str, object]) -> tuple:
+    return (name,) + tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _registry() -> None:
+    """Reset the registry in a freshly forked process and start its flusher (caller holds ``_LOCK``)."""
+    global _PID, _DIRTY
+    if _PID == os.getpid():
+        return
+    _PID = os.getpid()
+    _COUNTERS.clear()
+    _GAUGES.clear()
+    _HISTOGRAMS.clear()
+    _DIRTY = False
+    threading.Thread(target=_flush_loop, args=(_PID,), daemon=True).start()
+    # multiprocessing children leave through os._exit and skip atexit; run
+    # the final flush from their exit finalizers instead
+    multiprocessing.util.Finalize(None, flush, exitpriority=0)
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Add *amount* to a counter."""
+    global _DIRTY
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _LOCK:
+        _registry()
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + amount
+        _DIRTY = True
+
+
+def gauge_add(name: str, amount: float, **labels) -> None:
+    """Move a gauge of this process by *amount*."""
+    global _DIRTY
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _LOCK:
+        _registry()
+        _GAUGES[key] = _GAUGES.get(key, 0) + amount
+        _DIRTY = True
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Record one histogram observation."""
+    global _DIRTY
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _LOCK:
+        _registry()
+        series = _HISTOGRAMS.get(key)
+        if series is None:
+            series = _HISTOGRAMS[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        series[0][bisect_left(BUCKETS, seconds)] += 1
+        series[1] += seconds
+        _DIRTY = True
+
+
+@contextmanager
+def timer(name: str, errors: Optional[str] = None, **labels):
+    """Observe the duration of the ``with`` block into histogram *name*.
+
+    If the block raises and *errors* names a counter, it is incremented with
+    the same labels.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors:
+            inc(errors, **labels)
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def register_collector(name: str, collect: Callable[[], float]) -> None:
+    """Report gauge *name* as ``collect()`` at scrape time (for machine-wide values)."""
+    _COLLECTORS[name] = collect
+
+# ---------------------------------------------------------------------------
+# Per-process files
+# ---------------------------------------------------------------------------
+
+def flush() -> None:
+    """Write this process's totals to its file in ``METRICS_DIR``."""
+    global _DIRTY
+    with _LOCK:
+        if _PID != os.getpid() or not _DIRTY:
+            return
+        snapshot = {
+            "pid": _PID,
+            "counters": [[list(k), v] for k, v in _COUNTERS.items()],
+            "gauges": [[list(k), v] for k, v in _GAUGES.items()],
+            "histograms": [[list(k), counts[:], total] for k, (counts, total) in _HISTOGRAMS.items()],
+        }
+        _DIRTY = False
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(snapshot, fh)
+        os.replace(tmp, os.path.join(METRICS_DIR, f"{snapshot['pid']}.json"))
+    except OSError as e:
+        print(f"Metrics flush failed: {e}", file=sys.stderr)
+
+
+def _flush_loop(pid: int) -> None:
+    while _PID == pid:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+
+atexit.register(flush)
+
+
+def clear_dir() -> None:
+    """Remove every process file (called once by the gunicorn master on start)."""
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# ---------------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------------
+
+def _from_json(key: list) -> tuple:
+    """A series key as stored by ``flush`` (label pairs become lists) back to a tuple."""
+    return (key[0],) + tuple(tuple(pair) for pair in key[1:])
+
+
+def _merged():
+    """Counters, gauges and histograms summed over every process file."""
+    counters, gauges, histograms = {}, {}, {}
+    try:
+        names = [n for n in os.listdir(METRICS_DIR) if n.endswith(".json")]
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as fh:
+                snapshot = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for key, value in snapshot["counters"]:
+            key = _from_json(key)
+            counters[key] = counters.get(key, 0) + value
+        if _alive(snapshot["pid"]):
+            for key, value in snapshot["gauges"]:
+                key = _from_json(key)
+                gauges[key] = gauges.get(key, 0) + value
+        for key, counts, total in snapshot["histograms"]:
+            merged = histograms.setdefault(_from_json(key), [[0] * len(counts), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+    return counters, gauges, histograms
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    """A sample value without rounding: integers exactly, other floats by ``repr``."""
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _labels(pairs, le: Optional[str] = None) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in pairs]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    flush()
+    counters, gauges, histograms = _merged()
+    for name, collect in _COLLECTORS.items():
+        try:
+            gauges[(name,)] = collect()
+        except Exception as e:
+            print(f"Metrics collector {name} failed: {e}", file=sys.stderr)
+
+    lines: List[str] = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for key in sorted(k for k in histograms if k[0] == name):
+                counts, total = histograms[key]
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(key[1:], str(bound))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(key[1:])} {total:.6f}")
+                lines.append(f"{name}_count{_labels(key[1:])} {cumulative}")
+        else:
+            values = counters if kind == "counter" else gauges
+            for key in sorted(k for k in values if k[0] == name):
+                lines.append(f"{name}{_labels(key[1:])} {_number(values[key])}")
+    return "\n".join(lines) + "\n"
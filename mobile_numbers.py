@@ -0,0 +1,35 @@
+# mobile_numbers.py
+"""Customer mobile numbers as integer join keys.
+
+The OSID workbook (warranty lookup) and the OSG / product exports (mapping)
+all identify customers by mobile number, and Excel hands those back as
+floats (``9876543210.0``), integers or text. ``mobile_keys`` turns such a
+column into int64 keys so they can be indexed, sorted and joined in bulk.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Smallest float that no longer fits in int64 (2**63)
+_INT64_LIMIT = 2.0 ** 63
+
+
+def mobile_keys(values: pd.Series) -> np.ndarray:
+    """Normalise a mobile column to int64 keys, ``-1`` where it is not a number.
+
+    Excel hands mobiles back as floats (``9876543210.0``) or text. Text with a
+    leading zero is left unkeyed so it can never collide with the shorter
+    number it would parse to. Numbers too large for int64 (bad cells) are
+    left unkeyed too.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.astype("float64")
+    else:
+        text = values.astype(str).str.strip()
+        numbers = pd.to_numeric(text.where(~text.str.startswith("0", na=False)), errors="coerce")
+    numbers = numbers.to_numpy(dtype="float64", na_value=np.nan)
+
+    keys = np.full(len(numbers), -1, dtype=np.int64)
+    valid = np.isfinite(numbers) & (numbers >= 0) & (numbers < _INT64_LIMIT) & (numbers == np.floor(numbers))
+    keys[valid] = numbers[valid].astype(np.int64)
+    return keys
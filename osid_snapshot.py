@@ -0,0 +1,191 @@
+# osid_snapshot.py
+"""Columnar snapshot of the Onsitego OSID workbook.
+
+Parsing ``Onsitego OSID (1).xlsx`` with openpyxl takes seconds, and every
+warranty lookup waits on it after a restart. This module stores the
+normalised frame and its lookup indexes as uncompressed Arrow IPC (Feather v2)
+files next to the workbook:
+
+- ``<workbook>.snapshot.arrow``      – the projected, normalised frame.
+- ``<workbook>.<name>.idx.arrow``    – one file per named lookup index.
+
+Every file carries the source workbook's mtime and size in its schema
+metadata. A snapshot is only used while that signature matches the workbook on
+disk; otherwise the caller re-parses the xlsx and writes a fresh snapshot.
+Reads go through a memory map, so a warm snapshot loads without copying the
+file into the Python heap. With ``zero_copy=True`` the frame stays backed by
+the mapped Arrow buffers, so every process that attaches to the same snapshot
+shares one copy of the data through the OS page cache. Snapshots are replaced
+with an atomic rename; processes still holding the old mapping keep reading
+the old file until they reload.
+
+``build_lock`` serialises snapshot builds across processes, so when several
+gunicorn workers start together only one of them parses the workbook.
+
+pyarrow is optional. Without it every read misses and writes are skipped.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - depends on the deployment
+    pa = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+# Bump when the on-disk layout of the frame or an index changes.
+SNAPSHOT_VERSION = 3
+_META_KEY = b"osid_snapshot"
+
+# ---------------------------------------------------------------------------
+# Paths & signatures
+# ---------------------------------------------------------------------------
+
+def snapshot_path(source: str) -> str:
+    """Path of the frame snapshot for *source*."""
+    return f"{source}.snapshot.arrow"
+
+
+def index_path(source: str, name: str) -> str:
+    """Path of the index snapshot called *name* for *source*."""
+    return f"{source}.{name}.idx.arrow"
+
+
+def lock_path(source: str) -> str:
+    """Path of the lock file guarding snapshot builds for *source*."""
+    return f"{source}.snapshot.lock"
+
+
+def source_signature(source: str) -> Dict[str, float]:
+    """Identify the current contents of *source* by mtime and size."""
+    st = os.stat(source)
+    return {"version": SNAPSHOT_VERSION, "mtime": st.st_mtime, "size": st.st_size}
+
+# ---------------------------------------------------------------------------
+# Low-level Arrow IPC helpers
+# ---------------------------------------------------------------------------
+
+def _write_table(table: "pa.Table", path: str, signature: Dict[str, float]) -> None:
+    """Atomically write *table* to *path* tagged with *signature*."""
+    table = table.replace_schema_metadata({_META_KEY: json.dumps(signature).encode()})
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_table(path: str, signature: Dict[str, float]) -> Optional["pa.Table"]:
+    """Memory-map *path* and return its table if it matches *signature*."""
+    if not os.path.exists(path):
+        return None
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    meta = (table.schema.metadata or {}).get(_META_KEY)
+    if meta is None or json.loads(meta) != signature:
+        return None
+    return table
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def to_pandas(table: "pa.Table", zero_copy: bool = False) -> pd.DataFrame:
+    """Convert a snapshot table to a frame.
+
+    By default the data is copied into ordinary pandas columns, with missing
+    text as NaN like ``read_excel``. With *zero_copy* the columns are Arrow
+    backed and reference the table's (memory-mapped) buffers directly.
+    """
+    if zero_copy:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    df = table.to_pandas()
+    # Arrow hands missing text back as None; keep read_excel's NaN.
+    text_cols = df.select_dtypes(include="object").columns
+    if len(text_cols):
+        df[text_cols] = df[text_cols].where(df[text_cols].notna(), np.nan)
+    return df
+
+
+@contextlib.contextmanager
+def build_lock(source: str) -> Iterator[None]:
+    """Hold an exclusive cross-process lock while building *source*'s snapshot.
+
+    A no-op where ``fcntl`` is unavailable.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(source), "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def read_snapshot(
+    source: str, index_names: Tuple[str, ...] = (), zero_copy: bool = False
+) -> Optional[Tuple[pd.DataFrame, Dict[str, "pa.Table"], "pa.Table"]]:
+    """Return ``(frame, indexes, table)`` for *source* if a fresh snapshot exists.
+
+    *table* is the memory-mapped Arrow table behind *frame*; see ``to_pandas``
+    for *zero_copy*. Returns ``None`` when pyarrow is missing, any file is
+    absent, or any file was written for a different version of the workbook.
+    """
+    if pa is None or not os.path.exists(source):
+        return None
+    try:
+        signature = source_signature(source)
+        frame = _read_table(snapshot_path(source), signature)
+        if frame is None:
+            return None
+        indexes = {}
+        for name in index_names:
+            table = _read_table(index_path(source, name), signature)
+            if table is None:
+                return None
+            indexes[name] = table
+        return to_pandas(frame, zero_copy), indexes, frame
+    except Exception as exc:
+        print(f"Ignoring unreadable OSID snapshot for {source}: {exc}", file=sys.stderr)
+        return None
+
+
+def write_snapshot(source: str, df: pd.DataFrame, indexes: Dict[str, Dict[str, object]]) -> bool:
+    """Persist *df* and the named *indexes* for *source*.
+
+    Each index is a mapping of column name to equal-length array-likes.
+    Index files are written before the frame so a reader never sees a fresh
+    frame next to stale indexes. Returns ``True`` on success; failures (no
+    pyarrow, read-only disk, unconvertible data) are logged and ignored.
+    """
+    if pa is None:
+        return False
+    try:
+        signature = source_signature(source)
+        for name, columns in indexes.items():
+            _write_table(pa.table(columns), index_path(source, name), signature)
+        _write_table(pa.Table.from_pandas(df, preserve_index=False), snapshot_path(source), signature)
+        return True
+    except Exception as exc:
+        print(f"Could not write OSID snapshot for {source}: {exc}", file=sys.stderr)
+        return False
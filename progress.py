@@ -0,0 +1,163 @@
+# progress.py
+"""Stage-by-stage progress of the report pipelines.
+
+A ``Tracker`` records the stages a report request goes through (master load,
+upload parse, date normalisation, merge, aggregation, one render stage per
+sheet, save), each with its duration and row count:
+
+    tracker = progress.Tracker.for_request("Report 1", request)
+    tracker.begin("parse", file="OSG")
+    ...
+    tracker.end(rows=len(df))
+    tracker.close()
+
+Every request logs its stage timings on ``close``, and each stage's duration
+is recorded in the ``osg_stage_seconds`` histogram (see ``metrics``). When the request carries
+an ``X-Progress-Id`` header (report jobs pass their job id), the events are
+also appended as JSON lines to ``PROGRESS_DIR/<id>.jsonl``, so any gunicorn
+worker can serve them while the pipeline runs. The stream ends with a
+``close`` event.
+
+``stream`` turns such a file into a Server-Sent Events response body. Each
+response lasts at most ``PROGRESS_STREAM_SECONDS``, so that a stream never
+holds a worker for a whole report. The browser's ``EventSource`` then
+reconnects by itself and resumes after the last event id it saw.
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Iterator, Optional
+
+import metrics
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+PROGRESS_DIR = os.environ.get("PROGRESS_DIR", os.path.join(tempfile.gettempdir(), "osg_progress"))
+PROGRESS_TTL = float(os.environ.get("PROGRESS_TTL_MINUTES", "60")) * 60
+STREAM_SECONDS = float(os.environ.get("PROGRESS_STREAM_SECONDS", "20"))
+POLL_SECONDS = 0.25
+RETRY_MS = 500
+
+HEADER = "X-Progress-Id"
+_PROGRESS_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _path(progress_id: str) -> Optional[str]:
+    if not _PROGRESS_ID.match(progress_id or ""):
+        return None
+    return os.path.join(PROGRESS_DIR, progress_id + ".jsonl")
+
+
+def sweep() -> None:
+    """Remove event files untouched for longer than ``PROGRESS_TTL``."""
+    now = time.time()
+    try:
+        names = os.listdir(PROGRESS_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(PROGRESS_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > PROGRESS_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+# ---------------------------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------------------------
+
+class Tracker:
+    """Stage timings of one report request, optionally published under an id."""
+
+    def __init__(self, report: str, progress_id: Optional[str] = None):
+        self.report = report
+        self.metric_label = report.lower().replace(" ", "")  # "Report 1" -> "report1"
+        self.path = _path(progress_id) if progress_id else None
+        self.started = self._mark = time.time()
+        self.stage = None
+        self.detail = {}
+        self.timings = []
+        if self.path:
+            os.makedirs(PROGRESS_DIR, exist_ok=True)
+            sweep()
+
+    @classmethod
+    def for_request(cls, report: str, request) -> "Tracker":
+        return cls(report, request.headers.get(HEADER))
+
+    def _publish(self, event: str, **fields) -> None:
+        if not self.path:
+            return
+        record = {"event": event, "elapsed": round(time.time() - self.started, 3), **fields}
+        try:
+            with open(self.path, "a") as fh:
+                fh.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            print(f"Progress write failed: {e}", file=sys.stderr)
+            self.path = None
+
+    def begin(self, stage: str, **detail) -> None:
+        """Start *stage* (ending any stage still open); *detail* is published with it."""
+        if self.stage is not None:
+            self.end()
+        self.stage, self.detail, self._mark = stage, detail, time.time()
+        self._publish("start", stage=stage, **detail)
+
+    def end(self, rows: Optional[int] = None) -> None:
+        """End the current stage, recording the rows it produced."""
+        if self.stage is None:
+            return
+        seconds = time.time() - self._mark
+        self.timings.append((self.stage, self.detail, seconds, rows))
+        metrics.observe("osg_stage_seconds", seconds, report=self.metric_label, stage=self.stage)
+        self._publish("end", stage=self.stage, seconds=round(seconds, 3), rows=rows, **self.detail)
+        self.stage = None
+
+    def close(self, status: str = "done") -> None:
+        """End the pipeline: publish the final event and log the stage timings."""
+        self.end()
+        self._publish("close", status=status)
+        stages = ", ".join(
+            f"{stage}{'[' + ','.join(map(str, detail.values())) + ']' if detail else ''} {seconds:.2f}s"
+            f"{f' ({rows} rows)' if rows is not None else ''}"
+            for stage, detail, seconds, rows in self.timings)
+        print(f"{self.report} {status} in {time.time() - self.started:.2f}s: {stages or 'no stages'}", file=sys.stderr)
+
+# ---------------------------------------------------------------------------
+# Server-Sent Events
+# ---------------------------------------------------------------------------
+
+def stream(progress_id: str, start: int = 0) -> Iterator[str]:
+    """SSE body replaying the events of *progress_id* from index *start*.
+
+    Ends after the ``close`` event (with a final ``end`` event so the client
+    can stop reconnecting) or after ``STREAM_SECONDS``.
+    """
+    path = _path(progress_id)
+    yield f"retry: {RETRY_MS}\n\n"
+    if path is None:
+        yield "event: end\ndata: {}\n\n"
+        return
+    deadline = time.time() + STREAM_SECONDS
+    index = start
+    while True:
+        try:
+            with open(path) as fh:
+                lines = fh.read().split("\n")[:-1]  # a line still being written has no newline yet
+        except OSError:
+            lines = []
+        for i in range(index, len(lines)):
+            yield f"id: {i}\ndata: {lines[i]}\n\n"
+            if json.loads(lines[i])["event"] == "close":
+                yield "event: end\ndata: {}\n\n"
+                return
+        index = max(index, len(lines))
+        if time.time() > deadline:
+            return
+        time.sleep(POLL_SECONDS)
@@ -0,0 +1,193 @@
+# report_cache.py
+"""Content-addressed disk cache of generated report workbooks.
+
+Managers often press "Generate" several times a day with the same uploads
+and dates. Each generated workbook is stored under a key that hashes
+everything the report depends on:
+
+- the bytes of every uploaded file (by form field),
+- the mtimes of the master workbooks,
+- the form parameters (``report_date``, ``prev_date``, ``time_slot``, ...)
+  and any per-report settings passed by the route,
+- ``CACHE_VERSION``, bumped whenever report output changes.
+
+A repeat request with the same inputs is served straight from disk. The
+workbook is the one written the first time, so its "Report Generated"
+timestamp is the original one.
+
+Entries are plain files in ``REPORT_CACHE_DIR``, written with an atomic
+rename so every gunicorn worker can share them. A hit refreshes the entry's
+mtime, which serves as its last-use time. Eviction drops entries unused for
+longer than the maximum age, then the least recently used ones until the
+cache fits its size budget. Hit/miss counts are kept per process and
+reported by ``stats``.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Mapping, Optional
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "osg_report_cache"))
+MAX_BYTES = int(float(os.environ.get("REPORT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+MAX_AGE = float(os.environ.get("REPORT_CACHE_MAX_AGE_HOURS", "24")) * 3600
+ENABLED = os.environ.get("REPORT_CACHE", "1") == "1"
+
+# Bump when the content of any generated report changes.
+CACHE_VERSION = 1
+_SUFFIX = ".xlsx"
+
+_STATS = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_LOCK = threading.Lock()
+
+# ---------------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------------
+
+def upload_digest(file) -> str:
+    """SHA-256 of an uploaded file's bytes; the stream is rewound afterwards."""
+    if file is None:
+        return "-"
+    digest = hashlib.sha256()
+    file.stream.seek(0)
+    for chunk in iter(lambda: file.stream.read(1 << 20), b""):
+        digest.update(chunk)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+
+def report_key(report: str, params: Mapping[str, object], masters: Iterable[str] = ()) -> str:
+    """Cache key for *report* given its parameters (upload digests included)
+    and the master files it reads.
+    """
+    digest = hashlib.sha256(f"{report}|v{CACHE_VERSION}".encode())
+    for name in sorted(params):
+        digest.update(f"|{name}={params[name]!r}".encode())
+    for path in masters:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        digest.update(f"|master:{path}={mtime!r}".encode())
+    return digest.hexdigest()
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+def _path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key + _SUFFIX)
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+
+def get(key: str) -> Optional[bytes]:
+    """Stored workbook for *key*, or ``None`` on a miss."""
+    if not ENABLED:
+        return None
+    path = _path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > MAX_AGE:
+            os.remove(path)
+            raise FileNotFoundError(path)
+        with open(path, "rb") as fh:
+            data = fh.read()
+        os.utime(path)
+    except OSError:
+        _count("misses")
+        return None
+    _count("hits")
+    return data
+
+
+def put(key: str, data: bytes) -> None:
+    """Store *data* under *key*, then evict down to the size budget."""
+    if not ENABLED:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, _path(key))
+    except OSError as e:
+        print(f"Report cache write failed: {e}", file=sys.stderr)
+        return
+    _count("stores")
+    evict()
+
+
+def _entries():
+    """(path, size, mtime) of every cache entry, oldest use first."""
+    entries = []
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return entries
+    for name in names:
+        if not name.endswith(_SUFFIX):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((path, st.st_size, st.st_mtime))
+    entries.sort(key=lambda e: e[2])
+    return entries
+
+
+def evict() -> int:
+    """Drop expired entries, then least recently used ones over ``MAX_BYTES``.
+
+    Returns the number of entries removed.
+    """
+    entries = _entries()
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for path, size, mtime in entries:
+        if now - mtime <= MAX_AGE and total <= MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+    if removed:
+        _count("evictions", removed)
+    return removed
+
+
+def clear() -> None:
+    """Remove every entry (counters are kept)."""
+    for path, _, _ in _entries():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def stats() -> Dict[str, object]:
+    """Hit/miss counters of this process plus the cache's current size."""
+    with _LOCK:
+        counts = dict(_STATS)
+    lookups = counts["hits"] + counts["misses"]
+    entries = _entries()
+    counts.update(
+        hit_ratio=round(counts["hits"] / lookups, 3) if lookups else None,
+        entries=len(entries),
+        bytes=sum(size for _, size, _ in entries),
+        enabled=ENABLED,
+    )
+    return counts
@@ -0,0 +1,199 @@
+# report_metrics.py
+"""Store metrics for the OSG sales report (Report 1).
+
+``aggregate_stores`` turns the parsed uploads into the wide per-store frame.
+Store columns arrive as ``store_dimension`` categoricals, so every row
+already carries an integer store code. Every source slice
+(FTD/MTD OSG, FTD/MTD product, previous month) is tagged with its measure,
+and the concatenated (store, measure) keys are summed in one binning pass
+that is already the stores x measures pivot. The RBM assignment is joined
+once at the end.
+
+``add_ratios`` derives the per-store ratio columns from the summed
+measures using whole-column NumPy division, with zero denominators masked
+to 0:
+
+- ``DIFF %``               – MTD value growth over the previous month.
+- ``ASP``                  – average selling price (MTD value / MTD count).
+- ``FTD Value Conversion`` – OSG value as % of product value, for the day.
+- ``MTD Value Conversion`` – the same, month to date.
+
+``group_totals`` produces the totals rows (for all stores and for every
+RBM) from one grouped aggregation. The sheet writers read those rows
+instead of re-summing columns per sheet.
+"""
+
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Summed per store, per RBM and overall
+SUM_COLUMNS = [
+    'FTD Count', 'FTD Value', 'MTD Count', 'MTD Value',
+    'Product_FTD_Count', 'Product_FTD_Amount', 'Product_MTD_Count', 'Product_MTD_Amount',
+    'PREV MONTH SALE',
+]
+
+# Ratio column -> (numerator, denominator, scale); numerator may be a
+# (minuend, subtrahend) pair for growth rates.
+RATIOS = {
+    'DIFF %': (('MTD Value', 'PREV MONTH SALE'), 'PREV MONTH SALE', 100),
+    'ASP': ('MTD Value', 'MTD Count', 1),
+    'FTD Value Conversion': ('FTD Value', 'Product_FTD_Amount', 100),
+    'MTD Value Conversion': ('MTD Value', 'Product_MTD_Amount', 100),
+}
+
+# Measure tag -> (count column, value column) in the wide frame
+MEASURES = {
+    'FTD': ('FTD Count', 'FTD Value'),
+    'MTD': ('MTD Count', 'MTD Value'),
+    'Product FTD': ('Product_FTD_Count', 'Product_FTD_Amount'),
+    'Product MTD': ('Product_MTD_Count', 'Product_MTD_Amount'),
+    'Previous': (None, 'PREV MONTH SALE'),
+}
+
+Totals = namedtuple("Totals", ["overall", "by_group"])
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+def aggregate_stores(osg: pd.DataFrame, product: pd.DataFrame, prev: Optional[pd.DataFrame],
+                     report_date, prev_date, store_list: pd.Series, rbm_df: pd.DataFrame) -> pd.DataFrame:
+    """Wide per-store frame for Report 1, one row per store.
+
+    *osg* and *product* need ``Store``, ``DATE``, ``QUANTITY`` and ``AMOUNT``;
+    *prev* (optional) ``Store``, ``DATE`` and ``AMOUNT``. Every ``Store``
+    column, *store_list* and *rbm_df*'s included, must be a categorical from
+    one ``StoreDimension.encode`` call. Rows cover every store in
+    *store_list* and both uploads, in that order of first appearance.
+    Measures a store has no sales for are left as NaN.
+    """
+    sources = [store_list, osg['Store'], product['Store']] + ([prev['Store']] if prev is not None else [])
+    stores = store_list.cat.categories
+    # Shift the category codes by one so missing stores (-1) become id 0
+    ids = [src.cat.codes.to_numpy(np.int64) + 1 for src in sources]
+    # Report rows follow first appearance of a store id in the list and uploads
+    _, row_ids = pd.factorize(np.concatenate(ids[:3]))
+    n_report = len(row_ids)
+    row_of = np.full(len(stores) + 1, -1, dtype=np.int64)
+    row_of[row_ids] = np.arange(n_report)
+    row_of[0] = -1
+    code_of = {name: row_of[store_ids] for name, store_ids in zip(['osg', 'product', 'prev'], ids[1:])}
+
+    today = pd.to_datetime(report_date)
+    prev_month = pd.to_datetime(prev_date)
+    n_measures = len(MEASURES)
+    keys, counts, values = [], [], []
+
+    def tag(name, df, measure, mask):
+        rows = code_of[name][mask]
+        keep = rows >= 0
+        keys.append(rows[keep] * n_measures + list(MEASURES).index(measure))
+        qty = df['QUANTITY'].to_numpy(float)[mask] if 'QUANTITY' in df.columns else np.zeros(mask.sum())
+        counts.append(np.nan_to_num(qty[keep]))
+        values.append(np.nan_to_num(df['AMOUNT'].to_numpy(float)[mask][keep]))
+
+    for name, df, prefix in (('osg', osg, ''), ('product', product, 'Product ')):
+        month = (df['DATE'].dt.month == today.month).to_numpy()
+        day = month & (df['DATE'].dt.normalize() == today.normalize()).to_numpy()
+        tag(name, df, prefix + 'MTD', month)
+        tag(name, df, prefix + 'FTD', day)
+    if prev is not None:
+        tag('prev', prev, 'Previous', (prev['DATE'].dt.month == prev_month.month).to_numpy())
+
+    # Single pivot: bin (row, measure) keys into a stores x measures grid
+    keys = np.concatenate(keys)
+    size = n_report * n_measures
+    seen = np.bincount(keys, minlength=size).reshape(-1, n_measures) > 0
+    count_sums = np.bincount(keys, weights=np.concatenate(counts), minlength=size).reshape(-1, n_measures)
+    value_sums = np.bincount(keys, weights=np.concatenate(values), minlength=size).reshape(-1, n_measures)
+
+    columns = {'Store': pd.Categorical.from_codes(row_ids - 1, categories=stores)}
+    for i, (count_col, value_col) in enumerate(MEASURES.values()):
+        if count_col is not None:
+            columns[count_col] = np.where(seen[:, i], count_sums[:, i], np.nan)
+        columns[value_col] = np.where(seen[:, i], value_sums[:, i], np.nan)
+    return pd.DataFrame(columns).merge(rbm_df, on='Store', how='left')
+
+# ---------------------------------------------------------------------------
+# Ratios & totals
+# ---------------------------------------------------------------------------
+
+
+def _ratio(df: pd.DataFrame, numerator, denominator: str, scale: int) -> np.ndarray:
+    """``round(num / den * scale, 2)`` per row, 0 where the denominator is 0.
+
+    Like the row-wise formula it replaces, an all-zero result stays integer.
+    """
+    if isinstance(numerator, tuple):
+        num = df[numerator[0]].to_numpy(float) - df[numerator[1]].to_numpy(float)
+    else:
+        num = df[numerator].to_numpy(float)
+    den = df[denominator].to_numpy(float)
+    valid = den != 0
+    if not valid.any():
+        return np.zeros(len(df), dtype=np.int64)
+    out = np.zeros(len(df))
+    np.divide(num, den, out=out, where=valid)
+    return _round2(out * scale)
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """``round(v, 2)`` with Python's exact rounding, vectorized.
+
+    ``np.round`` scales by 100 first, which can push a value like 2.675
+    (stored as 2.67499...) onto the .5 boundary and round it up. Only values
+    that land near a boundary are re-rounded one by one.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def add_ratios(df: pd.DataFrame) -> pd.DataFrame:
+    """Return *df* with the ``RATIOS`` columns computed from its sums."""
+    return df.assign(**{name: _ratio(df, *spec) for name, spec in RATIOS.items()})
+
+
+def _scalar_ratios(row: pd.Series) -> pd.Series:
+    """Ratios for one totals row, as plain ``int`` 0 or rounded ``float``."""
+    values = {}
+    for name, (numerator, denominator, scale) in RATIOS.items():
+        den = row[denominator]
+        if den == 0:
+            values[name] = 0
+            continue
+        num = row[numerator[0]] - row[numerator[1]] if isinstance(numerator, tuple) else row[numerator]
+        values[name] = round((num / den) * scale, 2)
+    return pd.Series(values, dtype=object)
+
+
+def group_totals(df: pd.DataFrame, by: Optional[str] = 'RBM') -> Totals:
+    """Totals for every *by* group and for all rows, from one aggregation.
+
+    Each totals row holds the ``SUM_COLUMNS`` sums, ``Stores`` (row count),
+    ``Active Stores`` (rows with FTD sales) and the ``RATIOS`` evaluated on
+    the sums. ``by_group`` is indexed by the *by* value (missing values form
+    their own group); ``overall`` is a single row.
+    """
+    measures = df[SUM_COLUMNS].assign(**{
+        'Stores': 1,
+        'Active Stores': (df['FTD Count'] > 0).astype(np.int64),
+    })
+    if by is not None and by in df.columns:
+        by_group = measures.groupby(df[by], dropna=False, sort=False).sum()
+        overall = by_group.sum()
+    else:
+        by_group = measures.iloc[:0]
+        overall = measures.sum()
+    ratios = pd.DataFrame([_scalar_ratios(row) for _, row in by_group.iterrows()],
+                          index=by_group.index, columns=list(RATIOS), dtype=object)
+    by_group = pd.concat([by_group, ratios], axis=1)
+    overall = pd.concat([overall.astype(object), _scalar_ratios(overall)])
+    return Totals(overall, by_group)
@@ -0,0 +1,238 @@
+# sheet_writer.py
+"""Bulk row output for the xlsxwriter report sheets.
+
+The report tables used to be written with one ``worksheet.write`` call and
+one format decision per cell, inside ``DataFrame.iterrows``. Here the values
+come straight from the column arrays and every format is chosen up front as
+a per-row array, so writing a row is a handful of ``write_row`` calls, one
+per run of adjacent columns that share a format.
+
+Workbooks are opened with ``constant_memory``: xlsxwriter flushes each row to
+disk as soon as the next one starts, so peak memory no longer grows with the
+store count. Rows must therefore be written strictly top to bottom, and a
+row cannot be revisited once a later row has been started.
+
+``write_table`` describes a table column by column (``Column``) and writes
+it in one of two ways, chosen per report by a ``TableStyle``:
+
+- baked (default) – zebra striping and the above/below threshold formats
+  are resolved in Python into each cell's format, as the reports always
+  looked.
+- conditional     – every cell gets its column's base format and the
+  striping and thresholds become worksheet ``conditional_format`` ranges.
+  Files are smaller, and the thresholds stay live if values are edited in
+  Excel.
+
+``column_widths`` sizes the columns of one sheet, or of one sheet per group,
+from a single pass over the string lengths.
+
+``write_day_view`` writes the Day View (Report 2) workbook the same way:
+row styles are classified once over the frame and widths come from the
+frame, not from a rescan of the written cells.
+"""
+
+import os
+from collections import namedtuple
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from xlsxwriter.utility import xl_range
+
+# Options for ``pd.ExcelWriter(..., engine_kwargs=WORKBOOK_OPTIONS)``
+WORKBOOK_OPTIONS = {"options": {"constant_memory": True}}
+
+# A run of adjacent columns starting at ``first_col``: one value sequence per
+# column and one format per row.
+Block = namedtuple("Block", ["first_col", "columns", "formats"])
+
+# One table column: its values, base format, the format of alternate rows
+# and, for thresholded columns, the formats of values above / below
+# ``threshold`` (compared against the written values).
+Column = namedtuple("Column", ["values", "format", "alternate", "above", "below", "threshold"],
+                    defaults=(None, None, None, None))
+
+# Per-report styling: conversion threshold in percent and the writing mode
+TableStyle = namedtuple("TableStyle", ["conversion_threshold", "conditional"], defaults=(2.0, False))
+
+
+def table_style(report: str) -> TableStyle:
+    """Style for *report* (e.g. ``"REPORT1"``) from the environment.
+
+    ``<REPORT>_CONVERSION_THRESHOLD`` sets the threshold (default 2%) and
+    ``<REPORT>_CONDITIONAL_FORMATS=1`` switches to conditional formatting.
+    """
+    return TableStyle(
+        float(os.environ.get(f"{report}_CONVERSION_THRESHOLD", TableStyle._field_defaults["conversion_threshold"])),
+        os.environ.get(f"{report}_CONDITIONAL_FORMATS", "0") == "1",
+    )
+
+
+def pick(flags: np.ndarray, when_true, when_false) -> np.ndarray:
+    """Per-row format array: *when_true* where *flags* is set, else *when_false*."""
+    return np.array([when_false, when_true], dtype=object)[np.asarray(flags, dtype=np.intp)]
+
+
+def zebra(n: int) -> np.ndarray:
+    """True on every second row (the alternate-shade rows)."""
+    return np.arange(n) % 2 == 1
+
+
+def threshold_formats(values: np.ndarray, threshold: float, above, below, equal: np.ndarray) -> np.ndarray:
+    """*above*/*below* where *values* is over/under *threshold*, else the *equal* row format."""
+    return np.select([values > threshold, values < threshold], [above, below], default=equal)
+
+
+def write_rows(worksheet, first_row: int, blocks: Sequence[Block]) -> int:
+    """Write the table described by *blocks* from *first_row* down.
+
+    Returns the number of rows written.
+    """
+    rows = len(blocks[0].formats) if blocks else 0
+    prepared = [(block.first_col, list(zip(*block.columns)), list(block.formats)) for block in blocks]
+    for r in range(rows):
+        row = first_row + r
+        for first_col, values, formats in prepared:
+            worksheet.write_row(row, first_col, values[r], formats[r])
+    return rows
+
+
+def _runs(columns: Sequence[Column], conditional: bool):
+    """Split *columns* into runs that can share one ``write_row`` call.
+
+    Thresholded columns stand alone when formats are baked, since their
+    format depends on the value.
+    """
+    runs = []
+    for col, column in enumerate(columns):
+        own_format = column.threshold is not None and not conditional
+        key = (id(column.format), id(column.alternate) if not conditional else None)
+        if runs and not own_format and not runs[-1][2] and runs[-1][1] == key:
+            runs[-1][3].append(column)
+        else:
+            runs.append([col, key, own_format, [column]])
+    return [(first_col, members) for first_col, _, _, members in runs]
+
+
+def _baked_formats(column: Column, alt: np.ndarray) -> np.ndarray:
+    formats = pick(alt, column.alternate, column.format) if column.alternate is not None \
+        else np.full(len(alt), column.format, dtype=object)
+    if column.threshold is not None:
+        values = np.asarray(column.values, dtype=float)
+        formats = threshold_formats(values, column.threshold, column.above, column.below, formats)
+    return formats
+
+
+def write_table(worksheet, first_row: int, columns: Sequence[Column], style: TableStyle = TableStyle()) -> int:
+    """Write *columns* side by side from *first_row* down, starting at column 0.
+
+    Returns the number of rows written.
+    """
+    rows = len(columns[0].values) if columns else 0
+    alt = zebra(rows)
+    blocks = []
+    for first_col, members in _runs(columns, style.conditional):
+        if style.conditional:
+            formats = np.full(rows, members[0].format, dtype=object)
+        else:
+            formats = _baked_formats(members[0], alt)
+        blocks.append(Block(first_col, [m.values for m in members], formats))
+    write_rows(worksheet, first_row, blocks)
+
+    if style.conditional and rows:
+        _add_conditional_formats(worksheet, first_row, first_row + rows - 1, columns)
+    return rows
+
+
+def _add_conditional_formats(worksheet, top: int, bottom: int, columns: Sequence[Column]) -> None:
+    """Threshold and zebra rules for the table rows *top*..*bottom*.
+
+    Threshold rules are added first so they take precedence over the zebra
+    fill. Columns sharing an alternate format share one zebra rule.
+    """
+    stripes = {}
+    for col, column in enumerate(columns):
+        if column.threshold is not None:
+            worksheet.conditional_format(top, col, bottom, col, {
+                "type": "cell", "criteria": ">", "value": column.threshold, "format": column.above})
+            worksheet.conditional_format(top, col, bottom, col, {
+                "type": "cell", "criteria": "<", "value": column.threshold, "format": column.below})
+        if column.alternate is not None:
+            stripes.setdefault(id(column.alternate), (column.alternate, []))[1].append(col)
+
+    for alternate, cols in stripes.values():
+        ranges = [xl_range(top, col, bottom, col) for col in cols]
+        worksheet.conditional_format(top, cols[0], bottom, cols[0], {
+            "type": "formula", "criteria": f"=MOD(ROW()-{top + 1},2)=1",
+            "format": alternate, "multi_range": " ".join(ranges)})
+
+
+def column_widths(df: pd.DataFrame, headers: Sequence[str], by: Optional[str] = None):
+    """Column widths as the report sheets size them.
+
+    Each column gets the length of its longest ``str(value)`` or of its
+    header, whichever is greater, plus 2, and never less than 10. Returns a
+    Series indexed by header, or with *by* a DataFrame with one row per
+    group.
+    """
+    lengths = pd.DataFrame({h: np.strings.str_len(df[h].to_numpy().astype(str)) for h in headers}, index=df.index)
+    longest = lengths.groupby(df[by], sort=False).max() if by is not None else lengths.max()
+    floor = pd.Series({h: len(h) for h in headers})
+    if by is None:
+        return (longest.clip(lower=floor) + 2).clip(lower=10)
+    return (longest.clip(lower=floor, axis=1) + 2).clip(lower=10)
+
+# ---------------------------------------------------------------------------
+# Day View (Report 2)
+# ---------------------------------------------------------------------------
+
+DAY_VIEW_COLORS = {"header": "#4F81BD", "data": "#DCE6F1", "zero": "#F4CCCC", "total": "#10B981"}
+
+# xlsxwriter adds 5px of padding to every column width; openpyxl stores the
+# width as given. Subtracting the padding reproduces the openpyxl widths.
+_XLSXWRITER_PADDING = 5 / 7
+
+
+def _day_view_widths(df: pd.DataFrame, title: str) -> list:
+    """Longest non-empty value per column (header and title included) + 2."""
+    widths = []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        shown = values[values.astype(bool)]
+        longest = max(int(np.strings.str_len(shown.astype(str)).max(initial=0)), len(str(col)))
+        if i == 0:
+            longest = max(longest, len(title))
+        widths.append(longest + 2)
+    return widths
+
+
+def write_day_view(df: pd.DataFrame, title: str, output) -> None:
+    """Write the Day View table *df* (``Branch``, ``QUANTITY``, ``AMOUNT``, ending
+    with the ``TOTAL`` row) under a merged *title* row to *output*.
+    """
+    workbook = xlsxwriter.Workbook(output, WORKBOOK_OPTIONS["options"])
+    ws = workbook.add_worksheet("Store Report")
+    cell = {"border": 1, "align": "center"}
+    title_fmt = workbook.add_format({"bold": True, "font_color": "#FFFFFF", "align": "center", "bg_color": DAY_VIEW_COLORS["header"]})
+    header_fmt = workbook.add_format({**cell, "bold": True, "font_color": "#FFFFFF", "bg_color": DAY_VIEW_COLORS["header"]})
+    row_formats = {
+        "total": workbook.add_format({**cell, "bold": True, "font_color": "#FFFFFF", "bg_color": DAY_VIEW_COLORS["total"]}),
+        "zero": workbook.add_format({**cell, "bg_color": DAY_VIEW_COLORS["zero"]}),
+        "data": workbook.add_format({**cell, "bg_color": DAY_VIEW_COLORS["data"]}),
+    }
+
+    for i, width in enumerate(_day_view_widths(df, title)):
+        ws.set_column(i, i, width - _XLSXWRITER_PADDING)
+
+    last_col = len(df.columns) - 1
+    ws.merge_range(0, 0, 0, last_col, title, title_fmt)
+    ws.write_row(1, 0, list(df.columns), header_fmt)
+
+    # Row classes (total / zero amount / normal), decided for the whole frame at once
+    is_total = (df.iloc[:, 0] == "TOTAL").to_numpy()
+    is_zero = (df["AMOUNT"] <= 0).to_numpy()
+    classes = np.select([is_total, is_zero], [0, 1], default=2)
+    formats = np.array([row_formats["total"], row_formats["zero"], row_formats["data"]], dtype=object)[classes]
+    write_rows(ws, 2, [Block(0, [df[col].tolist() for col in df.columns], formats)])
+    workbook.close()
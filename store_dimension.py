@@ -0,0 +1,129 @@
+# store_dimension.py
+"""Store dimension shared by the report routes.
+
+Every report joins uploads against the stores named in the master files
+(``myG All Store.xlsx``, ``RBM,BDM,BRANCH.xlsx``, ``Future Store List.xlsx``).
+Exports spell the same store in different ways ("Kochi Edappally",
+"KOCHI  EDAPPALLY ", ...), and joining on raw strings turned each spelling
+into its own report row.
+
+``StoreDimension`` gives every store:
+
+- a canonical ``key``   – trimmed, upper-cased, whitespace collapsed.
+- a dense integer ``id`` – its position in the dimension.
+- a display ``name``    – the first spelling met in the master files.
+
+``aliases`` maps every raw spelling seen in the masters to its id.
+``encode`` turns Store columns into categoricals over the display names,
+so the reports group and join on the integer codes. Stores missing from the
+masters are added for that call only, under their first spelling.
+"""
+
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import master_data
+
+
+def canonical_key(name) -> Optional[str]:
+    """Key two spellings of the same store share; ``None`` for blanks."""
+    if pd.isna(name):
+        return None
+    key = " ".join(str(name).replace("\u00A0", " ").split()).upper()
+    return key or None
+
+
+class StoreDimension:
+    """Canonical stores built from one or more Store columns, in order."""
+
+    def __init__(self, *columns: pd.Series):
+        self.aliases: Dict[str, int] = {}
+        ids: Dict[str, int] = {}
+        names: List[str] = []
+        for column in columns:
+            for raw in pd.unique(column.dropna()):
+                key = canonical_key(raw)
+                if key is None:
+                    continue
+                if key not in ids:
+                    ids[key] = len(names)
+                    names.append(str(raw))
+                self.aliases.setdefault(raw, ids[key])
+        self._ids = ids
+        self.table = pd.DataFrame({"key": list(ids), "Store": names})
+        self.table.index.name = "id"
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def names(self) -> pd.Index:
+        return pd.Index(self.table["Store"])
+
+    def encode(self, *columns: pd.Series) -> List[pd.Series]:
+        """Encode *columns* as categoricals sharing one set of categories.
+
+        Each distinct raw value is resolved once (alias table first, then its
+        canonical key); rows take the code of their value. Blank values
+        encode as missing.
+        """
+        ids = dict(self._ids)
+        names = list(self.table["Store"])
+        encoded = []
+        for column in columns:
+            codes, uniques = pd.factorize(column)
+            lookup = np.empty(len(uniques) + 1, dtype=np.int64)
+            lookup[-1] = -1
+            for i, raw in enumerate(uniques):
+                store_id = self.aliases.get(raw)
+                if store_id is None:
+                    key = canonical_key(raw)
+                    if key is None:
+                        store_id = -1
+                    elif key in ids:
+                        store_id = ids[key]
+                    else:
+                        store_id = ids[key] = len(names)
+                        names.append(str(raw))
+                lookup[i] = store_id
+            encoded.append((column, lookup[codes]))
+
+        categories = pd.Index(names, dtype=object)
+        if len(names) > len(self):
+            print(f"{len(names) - len(self)} store(s) not in the master files", file=sys.stderr)
+        return [pd.Series(pd.Categorical.from_codes(codes, categories=categories),
+                          index=column.index, name=column.name)
+                for column, codes in encoded]
+
+# ---------------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------------
+
+_DIMENSION: Optional[StoreDimension] = None
+_DIMENSION_KEY = None
+_LOCK = threading.Lock()
+
+
+def _same(sources, key) -> bool:
+    return key is not None and all(a is b for a, b in zip(sources, key))
+
+
+def get_store_dimension() -> StoreDimension:
+    """Dimension over the current master files.
+
+    Rebuilt only when ``master_data`` reloads one of them (its frames are
+    replaced on reload, so the cache holds the frames it was built from).
+    """
+    global _DIMENSION, _DIMENSION_KEY
+    sources = (master_data.get_store_list(), master_data.get_rbm_map(), master_data.get_future_stores())
+    if _same(sources, _DIMENSION_KEY):
+        return _DIMENSION
+    with _LOCK:
+        if not _same(sources, _DIMENSION_KEY):
+            _DIMENSION = StoreDimension(*(df["Store"] for df in sources))
+            _DIMENSION_KEY = sources
+        return _DIMENSION
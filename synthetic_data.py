@@ -0,0 +1,278 @@
+"""
+Generate realistic synthetic inputs for the report, mapping and warranty paths.
+
+Writes one dataset directory containing every file the app reads:
+
+- osg_sales.xlsx          – current-month OSG sales (Report 1, mapping).
+- product_sales.xlsx      – current-month product sales (Report 1, mapping).
+- prev_osg_sales.xlsx     – previous-month OSG sales (Report 1).
+- day_sales.xlsx          – one day's sales by branch (Report 2).
+- the three master workbooks, under the names master_data expects.
+- the OSID workbook, under claim_processor.EXCEL_FILE.
+
+The uploads are as messy as real exports:
+
+- Headers are drawn from the column_schema aliases every reader of the file
+  accepts, with random case, padding and non-breaking spaces, in random
+  order, and come with unused columns.
+- Dates mix day-first text in two formats, native Excel dates, serial
+  numbers and a few blanks.
+- Store names vary in case and whitespace, and some stores are missing from
+  the master files.
+
+OSG plans and products share customers, so the mapping finds real matches,
+and OSID mobiles are drawn from the same customers.
+
+Usage: python synthetic_data.py <out_dir> [rows] [stores] [seed]
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import master_data
+from claim_processor import EXCEL_FILE
+from mapping_engine import sku_category_mapping
+
+UPLOAD_FILES = {
+    "osg": "osg_sales.xlsx",
+    "product": "product_sales.xlsx",
+    "prev_osg": "prev_osg_sales.xlsx",
+    "day_sales": "day_sales.xlsx",
+}
+MANIFEST = "manifest.json"
+
+REPORT_DATE = pd.Timestamp("2026-10-15")
+PREV_DATE = pd.Timestamp("2026-09-15")
+
+SLABS = [(0, 5), (5, 10), (10, 20), (20, 40), (40, 80), (80, 200)]
+EXTRA_COLUMNS = ["Remarks", "Salesman", "GSTIN", "Region"]
+
+
+def _messy_header(rng, name):
+    variant = rng.integers(0, 4)
+    if variant == 0:
+        name = name.upper()
+    elif variant == 1:
+        name = name.title()
+    elif variant == 2:
+        name = f"  {name} "
+    else:
+        name = name.replace(" ", "\u00A0")
+    return name
+
+
+def _headers(rng, aliases):
+    """{field: messy header} choosing one alias per field."""
+    return {field: _messy_header(rng, str(rng.choice(options))) for field, options in aliases.items()}
+
+
+def _messy_stores(rng, names, n):
+    """*n* store names with case / whitespace variants of *names*."""
+    picked = rng.choice(names, n)
+    variant = rng.integers(0, 10, n)
+    out = picked.astype(object)
+    lower = variant == 0
+    padded = variant == 1
+    out[lower] = [s.lower() for s in picked[lower]]
+    out[padded] = [f" {s}  " for s in picked[padded]]
+    return out
+
+
+def _messy_dates(rng, start, days, n):
+    """Dates in [start, start + days) in the mix real uploads carry."""
+    dates = start + pd.to_timedelta(rng.integers(0, days, n), unit="D")
+    kind = rng.choice(5, n, p=[0.55, 0.15, 0.15, 0.13, 0.02])
+    out = np.empty(n, dtype=object)
+    out[kind == 0] = dates[kind == 0].strftime("%d-%m-%Y")
+    out[kind == 1] = dates[kind == 1].strftime("%d/%m/%Y")
+    out[kind == 2] = list(dates[kind == 2].to_pydatetime())
+    out[kind == 3] = (dates[kind == 3] - pd.Timestamp("1899-12-30")).days.astype(float)
+    out[kind == 4] = None
+    return out
+
+
+def _mobiles(rng, n):
+    return rng.integers(6_000_000_000, 9_999_999_999, n)
+
+
+def _shuffled(rng, frame):
+    """*frame* with unused columns added and the columns in random order."""
+    for name in EXTRA_COLUMNS[: rng.integers(1, len(EXTRA_COLUMNS) + 1)]:
+        frame[name] = rng.choice(["", "NA", "-", "CHECK"], len(frame))
+    return frame[list(rng.permutation(frame.columns))]
+
+
+def write_xlsx(path, frame, sheet="Sheet1"):
+    """Write *frame* with xlsxwriter in constant-memory mode (fast for 1M rows)."""
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "default_date_format": "dd/mm/yyyy"})
+    ws = workbook.add_worksheet(sheet)
+    ws.write_row(0, 0, [str(c) for c in frame.columns])
+    # tolist() gives Python scalars, which xlsxwriter's write() dispatches on; None is left blank
+    columns = [frame[c].tolist() for c in frame.columns]
+    for r, row in enumerate(zip(*columns), start=1):
+        ws.write_row(r, 0, row)
+    workbook.close()
+
+# ---------------------------------------------------------------------------
+# Datasets
+# ---------------------------------------------------------------------------
+
+def store_names(stores):
+    return np.array([f"STORE {i:04d}" for i in range(stores)], dtype=object)
+
+
+def master_frames(rng, stores):
+    """Store list, RBM map and future store list for *stores* stores."""
+    names = store_names(stores)
+    rbms = np.array([f"RBM {i:02d}" for i in range(max(1, stores // 20))], dtype=object)
+    store_list = pd.DataFrame({"Store": names[: int(stores * 0.95)]})
+    rbm = pd.DataFrame({"BRANCH": names, "BDM": rng.choice(["BDM A", "BDM B", "BDM C"], stores),
+                        "RBM": rng.choice(rbms, stores)})
+    future = pd.DataFrame({"Store": names[: int(stores * 0.6)]})
+    return store_list, rbm, future
+
+
+def upload_frames(rng, rows, stores):
+    """The four uploads: OSG, product, previous-month OSG and day sales."""
+    names = np.concatenate([store_names(stores), np.array(["NEW STORE 1", "NEW STORE 2"], dtype=object)])
+    customers = _mobiles(rng, max(1, rows // 2))
+
+    categories = list(sku_category_mapping)
+    slabs = rng.integers(0, len(SLABS), rows)
+    sku_category = rng.choice(categories, rows)
+    sku = [f"{cat} : Slab : {SLABS[s][0]}K-{SLABS[s][1]}K : Dur : 1+{d}"
+           for cat, s, d in zip(sku_category, slabs, rng.integers(1, 4, rows))]
+    plan_customer = rng.choice(customers, rows)
+    month_start = REPORT_DATE.replace(day=1)
+    osg_headers = _headers(rng, {"DATE": ["Date", "DATE"], "Store": ["Branch", "Store", "Store Name"],
+                                 "QUANTITY": ["Qty", "Quantity"], "AMOUNT": ["Amount"],
+                                 "Customer Mobile": ["Customer Mobile", "Mobile No"],
+                                 "Retailer SKU": ["Retailer SKU", "Plan SKU"], "Plan Price": ["Plan Price"]})
+    osg = pd.DataFrame({
+        osg_headers["DATE"]: _messy_dates(rng, month_start, REPORT_DATE.day, rows),
+        osg_headers["Store"]: _messy_stores(rng, names, rows),
+        osg_headers["QUANTITY"]: rng.integers(1, 3, rows),
+        osg_headers["AMOUNT"]: rng.integers(199, 9999, rows),
+        osg_headers["Customer Mobile"]: plan_customer,
+        osg_headers["Retailer SKU"]: sku,
+        osg_headers["Plan Price"]: rng.integers(199, 9999, rows),
+    })
+
+    # Products: one per plan (bought by the same customer in the slab), plus unrelated sales
+    covered = rng.random(rows) < 0.8
+    eligible = [sku_category_mapping[c][0] for c in sku_category]
+    bounds = np.array(SLABS) * 1000
+    price = rng.integers(bounds[slabs, 0] + 1, bounds[slabs, 1])
+    extra = rows - int(covered.sum())
+    product_headers = _headers(rng, {"DATE": ["Date", "DATE"], "Store": ["Store", "Branch Name"],
+                                     "AMOUNT": ["Sold Price"], "QUANTITY": ["Quantity", "Qty"],
+                                     "Customer Mobile": ["Mobile No", "Customer Mobile"],
+                                     "Category": ["Category", "Product Category"], "Model": ["Model"],
+                                     "Brand": ["Brand"], "IMEI": ["IMEI", "Serial No"],
+                                     "Invoice Number": ["Invoice Number", "Invoice No"]})
+    all_categories = sorted({c for values in sku_category_mapping.values() for c in values})
+    product = pd.DataFrame({
+        product_headers["DATE"]: _messy_dates(rng, month_start, REPORT_DATE.day, rows),
+        product_headers["Store"]: _messy_stores(rng, names, rows),
+        product_headers["AMOUNT"]: np.concatenate([price[covered], rng.integers(500, 150000, extra)]),
+        product_headers["QUANTITY"]: 1,
+        product_headers["Customer Mobile"]: np.concatenate([plan_customer[covered], rng.choice(customers, extra)]),
+        product_headers["Category"]: np.concatenate([np.array(eligible, dtype=object)[covered], rng.choice(all_categories, extra)]),
+        product_headers["Model"]: [f"MODEL-{i}" for i in rng.integers(100, 999, rows)],
+        product_headers["Brand"]: rng.choice(["SAMSUNG", "LG", "SONY", "WHIRLPOOL", "PHILIPS"], rows),
+        product_headers["IMEI"]: [f"SN{i:012d}" for i in rng.integers(0, 10**12, rows)],
+        product_headers["Invoice Number"]: [f"INV{i:08d}" for i in rng.integers(0, 10**8, rows)],
+    })
+
+    prev_headers = _headers(rng, {"DATE": ["Date"], "Store": ["Branch", "Store"], "AMOUNT": ["Amount"]})
+    prev_start = PREV_DATE.replace(day=1)
+    prev = pd.DataFrame({
+        prev_headers["DATE"]: _messy_dates(rng, prev_start, prev_start.days_in_month, rows),
+        prev_headers["Store"]: _messy_stores(rng, names, rows),
+        prev_headers["AMOUNT"]: rng.integers(199, 9999, rows),
+    })
+
+    day_headers = _headers(rng, {"Store": ["Branch", "Store"], "QUANTITY": ["Qty", "Quantity"], "AMOUNT": ["Amount"]})
+    day_sales = pd.DataFrame({
+        day_headers["Store"]: _messy_stores(rng, names, rows),
+        day_headers["QUANTITY"]: rng.integers(1, 3, rows),
+        day_headers["AMOUNT"]: rng.integers(0, 9999, rows),
+    })
+    frames = {"osg": osg, "product": product, "prev_osg": prev, "day_sales": day_sales}
+    return {name: _shuffled(rng, frame) for name, frame in frames.items()}, customers
+
+
+def osid_frame(rng, rows, customers):
+    """OSID sheet rows for *customers* (one or more products each)."""
+    headers = _headers(rng, {"name": ["Customer Name", "Name"], "mobile": ["Mobile No", "Mobile"],
+                             "invoice": ["Invoice No"], "model": ["Model"], "serial": ["Serial No"], "osid": ["OSID"]})
+    return pd.DataFrame({
+        headers["name"]: [f"CUSTOMER {i}" for i in rng.integers(0, 10**6, rows)],
+        headers["mobile"]: rng.choice(customers, rows),
+        headers["invoice"]: [f"INV{i:08d}" for i in rng.integers(0, 10**8, rows)],
+        headers["model"]: [f"MODEL-{i}" for i in rng.integers(100, 999, rows)],
+        headers["serial"]: [f"SN{i:012d}" for i in rng.integers(0, 10**12, rows)],
+        headers["osid"]: [f"OSID{i:09d}" for i in rng.integers(0, 10**9, rows)],
+    })
+
+
+def generate(out_dir, rows=10_000, stores=150, seed=0):
+    """Write a dataset of *rows* rows per upload to *out_dir*; returns its manifest.
+
+    An existing dataset with the same parameters is reused.
+    """
+    params = {"rows": rows, "stores": stores, "seed": seed}
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+        if manifest["params"] == params:
+            return manifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    start_time = time.time()
+    rng = np.random.default_rng(seed)
+    store_list, rbm, future = master_frames(rng, stores)
+    uploads, customers = upload_frames(rng, rows, stores)
+    files = {
+        master_data.STORE_LIST_FILE: store_list,
+        master_data.RBM_FILE: rbm,
+        master_data.FUTURE_STORE_FILE: future,
+        EXCEL_FILE: osid_frame(rng, rows, customers),
+    }
+    files.update({UPLOAD_FILES[name]: frame for name, frame in uploads.items()})
+    for name, frame in files.items():
+        write_xlsx(os.path.join(out_dir, name), frame)
+
+    manifest = {
+        "params": params,
+        "files": {name: os.path.getsize(os.path.join(out_dir, name)) for name in files},
+        "sample_mobiles": [int(m) for m in rng.choice(customers, min(200, len(customers)))],
+    }
+    with open(manifest_path, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    print(f"Generated {rows:,}-row dataset in {out_dir} in {time.time() - start_time:.1f}s", file=sys.stderr)
+    return manifest
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    out_dir = sys.argv[1]
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    stores = int(sys.argv[3]) if len(sys.argv) > 3 else 150
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    manifest = generate(out_dir, rows, stores, seed)
+    for name, size in manifest["files"].items():
+        print(f"  {name:<32} {size / 1024:>10,.0f} KB")
+
+
+if __name__ == "__main__":
+    main()